@@ -1,16 +1,29 @@
+import hashlib
 import json
 import os
-import tempfile
-from typing import Dict, List
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 
-import requests
 from rtpy import Rtpy, rtpy
 from rtpy.artifacts_and_storage import RtpyArtifactsAndStorage
 from rtpy.tools import RtpyBase
 
+from conan_ci.disk_cache import DiskCache, sha1_of, sha1_of_file
 from conan_ci.model.build import Build
 from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.checkpoint import NodeChainCheckpoint
+from conan_ci.model.lockfile import Lockfile
 from conan_ci.model.node_info import NodeInfo
+from conan_ci.model.node_status import NodeStatus
+from conan_ci.sessions import get_session, share_session
+from conan_ci.tracing import span
+
+
+class NotFoundException(Exception):
+    """The file is not in the repo (404), other errors can't tell if it is there"""
 
 
 class ArtifactoryRepo(object):
@@ -18,6 +31,7 @@ class ArtifactoryRepo(object):
     af: Rtpy
     name: str
     af_store: RtpyArtifactsAndStorage
+    chunk_size = 1024 * 1024
 
     def __init__(self, base_url, name, af: Rtpy):
         self.url = "{}/api/conan/{}".format(base_url, name)
@@ -26,9 +40,9 @@ class ArtifactoryRepo(object):
         self.af_store = self.af.artifacts_and_storage
 
     def get_artifactory(self):
-        return Artifactory(self.af.settings.get("af_url"),
-                           self.af.settings.get("username"),
-                           self.af.settings.get("password"))
+        return get_artifactory(self.af.settings.get("af_url"),
+                               self.af.settings.get("username"),
+                               self.af.settings.get("password"))
 
     def list_files(self, folder: str):
         tmp = self.af_store.file_list(self.name, folder, options="&listFolders=0")
@@ -40,33 +54,88 @@ class ArtifactoryRepo(object):
     def as_meta(self):
         return MetaRepo(self.url, self.name, self.af)
 
+    def _auth(self):
+        return self.af.settings["username"], self.af.settings["password"]
+
+    def _get(self, path, headers=None, stream=False):
+        url = "{}/{}/{}".format(self.af.settings["af_url"], self.name, path)
+        ret = get_session().get(url, headers=headers or {}, auth=self._auth(), stream=stream)
+        if not ret.ok and ret.status_code != 304:
+            ret.close()
+            error = NotFoundException if ret.status_code == 404 else Exception
+            raise error("Error reading {} from {}: {}".format(path, self.name, ret))
+        return ret
+
+    def _check_sha1(self, response, sha1, path):
+        expected = response.headers.get("X-Checksum-Sha1")
+        if expected and expected != sha1:
+            raise Exception("Checksum mismatch reading {} from {}: "
+                            "{} != {}".format(path, self.name, sha1, expected))
+
     def read_file(self, path):
+        with span("artifactory.download", repo=self.name, path=path):
+            ret = self._get(path)
+        self._check_sha1(ret, sha1_of(ret.content), path)
+        return ret.content
+
+    def _stream_to_file(self, response, dest_path, path):
+        """Writes the response to 'dest_path' by chunks, it is only there if the sha1 of
+        the contents is the one of Artifactory"""
+        sha1 = hashlib.sha1()
+        tmp_path = "{}.part".format(dest_path)
         try:
-            return self.af.artifacts_and_storage.retrieve_artifact(self.name, path).content
-        except self.af.MalformedAfApiError as error:
-            print(self.name)
-            print(path)
-            print(dir(error))
-            print(error.response)
-            print("\n\n".join(getattr(error, attr) for attr in dir(error)))
+            with response, open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    sha1.update(chunk)
+                    f.write(chunk)
+            self._check_sha1(response, sha1.hexdigest(), path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             raise
+        os.replace(tmp_path, dest_path)
 
     def download_file(self, path, dest_folder):
-        profile_contents = self.read_file(path)
-        p_path = "/".join([dest_folder, os.path.basename(path)])
-        with open(p_path, "wb") as f:
-            f.write(profile_contents)
-        return p_path
+        dest_path = "/".join([dest_folder, os.path.basename(path)])
+        with span("artifactory.download", repo=self.name, path=path):
+            self._stream_to_file(self._get(path, stream=True), dest_path, path)
+        return dest_path
 
     def deploy(self, path, dest_path):
-        self.af_store.deploy_artifact(self.name, path, dest_path)
+        with open(path, "rb") as f:
+            self.deploy_data(dest_path, f)
 
     def deploy_contents(self, dest_path, contents):
-        tmp = tempfile.mkdtemp()
-        file_path = os.path.join(tmp, "file")
-        with open(file_path, "w") as fl:
-            fl.write(contents)
-        self.af_store.deploy_artifact(self.name, file_path, dest_path)
+        if isinstance(contents, str):
+            contents = contents.encode()
+        self.deploy_data(dest_path, contents)
+
+    def _sha1_of_data(self, data):
+        if isinstance(data, bytes):
+            return sha1_of(data)
+        sha1 = hashlib.sha1()
+        for chunk in iter(lambda: data.read(self.chunk_size), b""):
+            sha1.update(chunk)
+        data.seek(0)
+        return sha1.hexdigest()
+
+    def deploy_data(self, dest_path, data):
+        """Uploads 'data', bytes or a seekable binary file object (streamed), to 'dest_path'.
+        Nothing is sent if this process already deployed the same contents to that path, and
+        only the checksum if Artifactory already stores them (X-Checksum-Deploy)"""
+        url = "{}/{}/{}".format(self.af.settings["af_url"], self.name, dest_path)
+        sha1 = self._sha1_of_data(data)
+        if _deployed.get(url) == sha1:
+            return
+        with span("artifactory.deploy", repo=self.name, path=dest_path):
+            headers = {"X-Checksum-Deploy": "true", "X-Checksum-Sha1": sha1}
+            ret = get_session().put(url, headers=headers, auth=self._auth())
+            if ret.status_code == 404:  # Contents not in Artifactory
+                headers = {"X-Checksum-Sha1": sha1}
+                ret = get_session().put(url, data=data, headers=headers, auth=self._auth())
+        if not ret.ok:
+            raise Exception("Error deploying {} to {}: {}".format(dest_path, self.name, ret))
+        _deployed[url] = sha1
 
     def set_properties(self, props: Dict[str, List], path=None):
         path = path or "/"
@@ -75,11 +144,27 @@ class ArtifactoryRepo(object):
 
     def get_properties(self, path=None) -> Dict[str, List]:
         path = path or "/"
-        r = self.af_store.item_properties(self.name, path)
+        with span("artifactory.properties", repo=self.name, path=path):
+            r = self.af_store.item_properties(self.name, path)
         return r["properties"]
 
+    def _forget_deployed(self, path=""):
+        prefix = "{}/{}/{}".format(self.af.settings["af_url"], self.name, path)
+        for url in [url for url in _deployed if url.startswith(prefix)]:
+            _deployed.pop(url, None)
+
     def remove(self):
         self.af.repositories.delete_repository(self.name)
+        self._forget_deployed()
+
+    def remove_path(self, path):
+        """Removes a file or folder, nothing if it doesn't exist"""
+        try:
+            self.af_store.delete_item(self.name, path)
+        except RtpyBase.AfApiError as exc:
+            if exc.status_code != 404:
+                raise
+        self._forget_deployed(path)
 
     def copy_all_to_repo(self, dest_repo_name):
         retries = 4
@@ -92,14 +177,94 @@ class ArtifactoryRepo(object):
 
     def refresh_index(self):
         settings = self.af.settings
-        ret = requests.post(settings["af_url"] + "/api/conan/{}/reindex".format(self.name),
-                            auth=(settings["username"], settings["password"]))
+        ret = get_session().post(settings["af_url"] + "/api/conan/{}/reindex".format(self.name),
+                                 auth=(settings["username"], settings["password"]))
         if not ret.ok:
             raise Exception("Error refreshing the index of repository {}".format(self.name))
 
 
 class MetaRepo(ArtifactoryRepo):
 
+    cache = DiskCache.from_env()
+    # The files are created with the date of the start of the upload, so a file visible after
+    # a query can be older than the newest one returned, the last seconds are queried again
+    status_margin = 60
+
+    def _cache_key(self, path):
+        return "{}/{}".format(self.url, path)
+
+    def read_file(self, path):
+        """Read-through the disk cache. The cached files are validated with a conditional
+        request (the ETag of Artifactory is the sha1), the build names and numbers are reused
+        so not even the node locks can be taken as immutable"""
+        if self.cache is None:
+            return super(MetaRepo, self).read_file(path)
+        key = self._cache_key(path)
+        cached = self.cache.get(key)
+        headers = {"If-None-Match": sha1_of(cached)} if cached else {}
+        with span("artifactory.download", repo=self.name, path=path, cached=bool(cached)):
+            ret = self._get(path, headers)
+        if ret.status_code == 304:
+            return cached
+        contents = ret.content
+        self._check_sha1(ret, sha1_of(contents), path)
+        self.cache.put(key, contents)
+        return contents
+
+    def download_file(self, path, dest_folder):
+        """Streamed to the destination, also through the disk cache"""
+        if self.cache is None:
+            return super(MetaRepo, self).download_file(path, dest_folder)
+        dest_path = "/".join([dest_folder, os.path.basename(path)])
+        key = self._cache_key(path)
+        cached_path = self.cache.get_path(key)
+        headers = {"If-None-Match": sha1_of_file(cached_path)} if cached_path else {}
+        with span("artifactory.download", repo=self.name, path=path, cached=bool(cached_path)):
+            ret = self._get(path, headers, stream=True)
+            if ret.status_code == 304:
+                ret.close()
+                shutil.copyfile(cached_path, dest_path)
+            else:
+                self._stream_to_file(ret, dest_path, path)
+                self.cache.put_file(key, dest_path)
+        return dest_path
+
+    def remove(self):
+        super(MetaRepo, self).remove()
+        if self.cache is not None:  # A new repo with the same name is a different one
+            self.cache.clear()
+
+    def deploy(self, path, dest_path):
+        super(MetaRepo, self).deploy(path, dest_path)
+        if self.cache is not None:
+            self.cache.put_file(self._cache_key(dest_path), path)
+
+    def deploy_data(self, dest_path, data):
+        super(MetaRepo, self).deploy_data(dest_path, data)
+        if self.cache is not None and isinstance(data, bytes):  # The next read only validates
+            self.cache.put(self._cache_key(dest_path), data)
+
+    def _artifacts_key(self, remote_path):
+        return self._cache_key("artifacts/{}".format(remote_path))
+
+    def get_artifacts_files(self, remote_paths: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """The files of the revisioned package and export paths resolved before. They never
+        change, so they are only looked up in the disk cache, without any request"""
+        if self.cache is None:
+            return {}
+        ret = {}
+        for path in remote_paths:
+            cached = self.cache.get(self._artifacts_key(path))
+            if cached is not None:
+                ret[path] = json.loads(cached.decode())
+        return ret
+
+    def store_artifacts_files(self, files: Dict[str, List[Dict[str, str]]]):
+        if self.cache is None:
+            return
+        self.cache.put_many({self._artifacts_key(path): json.dumps(path_files).encode()
+                             for path, path_files in files.items() if path_files})
+
     @staticmethod
     def _project_lock_path(build: Build, build_conf: BuildConfiguration):
         project_ref = build_conf.project_ref.replace("/", "_").replace("@", "_")
@@ -107,11 +272,33 @@ class MetaRepo(ArtifactoryRepo):
                                               build_conf.profile_name)
 
     @staticmethod
-    def _node_lock_path(build: Build, build_conf: BuildConfiguration, node_info: NodeInfo):
+    def node_path(build: Build, build_conf: BuildConfiguration, node_info: NodeInfo):
         ref = node_info.ref.replace("/", "_").replace("@", "_")
         tmp = MetaRepo._project_lock_path(build, build_conf)
         return "{}/{}_{}".format(tmp, ref, node_info.id)
 
+    @staticmethod
+    def _last_lock_path(build_conf: BuildConfiguration):
+        project_ref = build_conf.project_ref.replace("/", "_").replace("@", "_")
+        return "last_locks/{}/{}".format(project_ref, build_conf.profile_name)
+
+    def store_last_project_lock(self, lockfile: Lockfile, build_conf: BuildConfiguration):
+        """The lock of the last regular build of a project, with the references of the graph
+        apart, the only thing needed to know if a change affects the project"""
+        remote_path = self._last_lock_path(build_conf)
+        self.deploy_contents("/".join([remote_path, "conan.lock"]), lockfile.dumps())
+        self.deploy_contents("/".join([remote_path, "refs.json"]),
+                             json.dumps(sorted(lockfile.refs())))
+
+    def get_last_project_refs(self, build_conf: BuildConfiguration):
+        """The references (without revisions) in the last lock of the project, None if the
+        project has never been built"""
+        try:
+            contents = self.read_file("/".join([self._last_lock_path(build_conf), "refs.json"]))
+        except NotFoundException:
+            return None
+        return json.loads(contents)
+
     def store_last_repo_lock(self, name: str, local_lock_path: str, profile_name):
         path = "lockfiles/{}/{}".format(name, profile_name)
         try:
@@ -133,52 +320,95 @@ class MetaRepo(ArtifactoryRepo):
 
     def store_node_lock(self, path: str, build: Build,
                         build_conf: BuildConfiguration, node_conf: NodeInfo):
-        remote_path = self._node_lock_path(build, build_conf, node_conf)
+        remote_path = self.node_path(build, build_conf, node_conf)
         print("Uploading lockfile to: {}".format(remote_path))
         self.deploy("/".join([path, "conan.lock"]),
                     "/".join([remote_path, "conan.lock"]))
 
-    def store_project_lock(self, path: str, build: Build, build_conf: BuildConfiguration):
+    def store_project_lockfile(self, lockfile: Lockfile, build: Build,
+                               build_conf: BuildConfiguration):
         remote_path = self._project_lock_path(build, build_conf)
         print("Uploading lockfile to: {}".format(remote_path))
-        self.deploy("/".join([path, "conan.lock"]),
-                    "/".join([remote_path, "conan.lock"]))
+        self.deploy_contents("/".join([remote_path, "conan.lock"]), lockfile.dumps())
 
     def store_install_log(self, log: str, build: Build, build_conf: BuildConfiguration,
                           node_conf: NodeInfo):
-        remote_path = self._node_lock_path(build, build_conf, node_conf)
+        remote_path = self.node_path(build, build_conf, node_conf)
         self.deploy_contents("/".join([remote_path, "install.log"]), log)
 
     def store_failure(self, build: Build, build_conf: BuildConfiguration,
                       node_conf: NodeInfo):
-        remote_path = self._node_lock_path(build, build_conf, node_conf)
+        remote_path = self.node_path(build, build_conf, node_conf)
         self.deploy_contents("/".join([remote_path, "FAILED"]), "")
 
     def store_success(self, build: Build, build_conf: BuildConfiguration,
-                      node_conf: NodeInfo):
-        remote_path = self._node_lock_path(build, build_conf, node_conf)
-        self.deploy_contents("/".join([remote_path, "OK"]), "")
-
-    def get_status(self, build: Build, build_conf: BuildConfiguration, node_conf: NodeInfo):
-        try:
-            remote_path = self._node_lock_path(build, build_conf, node_conf)
-            self.read_file("/".join([remote_path, "OK"]))
-            return True
-        except Exception:
-            return False
+                      node_conf: NodeInfo, build_seconds=None):
+        remote_path = self.node_path(build, build_conf, node_conf)
+        # The seconds as a property (matrix parameter), read with the status of the nodes
+        props = ";build_seconds={:.1f}".format(build_seconds) if build_seconds is not None else ""
+        self.deploy_contents("/".join([remote_path, "OK" + props]), "")
+
+    def remove_build_files(self, build: Build):
+        """The files of an earlier run of the same build (a restarted one), its status files
+        would be taken as the ones of the new jobs"""
+        self.remove_path("lockfiles/{}/{}".format(build.name, build.number))
+
+    def remove_node_files(self, build: Build, build_conf: BuildConfiguration,
+                          node_info: NodeInfo):
+        """The status files of a node to launch again"""
+        self.remove_path(self.node_path(build, build_conf, node_info))
+
+    def get_nodes_status(self, build: Build, since=None) -> Tuple[Dict[str, NodeStatus], str]:
+        """The status of the nodes of the build (by node_path) with files created from 'since'
+        on, with a single AQL query, and the 'since' of the next call. The files of a node
+        can be in different calls, and in several of them (see status_margin)"""
+        prefix = "lockfiles/{}/{}/".format(build.name, build.number)
+        criteria = {"repo": self.name,
+                    "path": {"$match": "{}*".format(prefix)},
+                    "$or": [{"name": name} for name in ("OK", "FAILED", "install.log",
+                                                         "conan.lock")]}
+        if since:
+            criteria["created"] = {"$gte": since}
+        q = 'items.find({}).include("path", "name", "created", "@build_seconds")'.format(
+            json.dumps(criteria))
+        with span("artifactory.aql", path=prefix):
+            ret_data = self.af.searches.artifactory_query_language(q)
+
+        ret = {}
+        newest = None
+        for res in ret_data["results"]:
+            name = res["name"]
+            seconds = None
+            for prop in res.get("properties", []):
+                if name == "OK" and prop.get("key") == "build_seconds":
+                    seconds = float(prop["value"])
+            status = NodeStatus(ok=name == "OK", failed=name == "FAILED",
+                                log=name == "install.log", lock=name == "conan.lock",
+                                build_seconds=seconds)
+            ret.setdefault(res["path"], NodeStatus()).update(status)
+            created = _parse_date(res["created"])
+            newest = created if newest is None else max(newest, created)
+
+        if newest is not None:
+            newest -= timedelta(seconds=self.status_margin)
+            if not since or newest > _parse_date(since):
+                since = newest.isoformat(timespec="milliseconds")
+        return ret, since
 
     def get_log(self, build: Build, build_conf: BuildConfiguration, node_conf: NodeInfo):
-        remote_path = self._node_lock_path(build, build_conf, node_conf)
+        remote_path = self.node_path(build, build_conf, node_conf)
         return self.read_file("/".join([remote_path, "install.log"]))
 
-    def download_node_lock(self, path: str, build: Build, build_conf: BuildConfiguration,
-                           node_info: NodeInfo):
-
-        remote_lock_path = self._node_lock_path(build, build_conf, node_info)
-        print("Downloading lockfile from: {}".format(remote_lock_path))
+    def get_node_lock(self, build: Build, build_conf: BuildConfiguration,
+                      node_info: NodeInfo) -> Lockfile:
+        remote_lock_path = self.node_path(build, build_conf, node_info)
+        print("Reading lockfile from: {}".format(remote_lock_path))
+        return Lockfile.loads(self.read_file("/".join([remote_lock_path, "conan.lock"])))
 
-        remote_path = "/".join([remote_lock_path, "conan.lock"])
-        self.download_file(remote_path, path)
+    def get_project_lock(self, build: Build, build_conf: BuildConfiguration) -> Lockfile:
+        remote_lock_path = self._project_lock_path(build, build_conf)
+        print("Reading lockfile from: {}".format(remote_lock_path))
+        return Lockfile.loads(self.read_file("/".join([remote_lock_path, "conan.lock"])))
 
     def download_project_lock(self, path: str, build: Build, build_conf: BuildConfiguration):
 
@@ -188,6 +418,31 @@ class MetaRepo(ArtifactoryRepo):
         remote_path = "/".join([remote_lock_path, "conan.lock"])
         self.download_file(remote_path, path)
 
+    @staticmethod
+    def _checkpoint_path(build: Build):
+        return "lockfiles/{}/{}/checkpoint.json".format(build.name, build.number)
+
+    def store_checkpoint(self, build: Build, checkpoint: NodeChainCheckpoint):
+        self.deploy_contents(self._checkpoint_path(build), json.dumps(checkpoint.dumps()))
+
+    def get_checkpoint(self, build: Build):
+        try:
+            tmp = self.read_file(self._checkpoint_path(build))
+        except NotFoundException:  # Any other error would start the build again from scratch
+            return None
+        return NodeChainCheckpoint.loads(json.loads(tmp))
+
+    def get_build_durations(self) -> Dict[str, Dict[str, float]]:
+        """Historical build seconds of every reference (without revision) by profile"""
+        try:
+            tmp = self.read_file("build_durations.json")
+        except NotFoundException:
+            return {}
+        return json.loads(tmp)
+
+    def store_build_durations(self, durations: Dict[str, Dict[str, float]]):
+        self.deploy_contents("build_durations.json", json.dumps(durations))
+
     def get_profile_names(self):
         return self.list_files("profiles")
 
@@ -196,6 +451,25 @@ class MetaRepo(ArtifactoryRepo):
         projects_ref = json.loads(p)["projects"]
         return projects_ref
 
+    def get_worker_limits(self) -> Dict[str, int]:
+        """Max running jobs by worker class, "worker_limits" in the config.json"""
+        p = self.read_file("config.json")
+        return json.loads(p).get("worker_limits", {})
+
+    def get_profile_workers(self, profiles_names) -> Dict[str, str]:
+        """The worker class of the profiles with a 'worker' property"""
+        ret = {}
+        for profile_name in profiles_names:
+            try:
+                props = self.get_properties("profiles/{}".format(profile_name))
+            except RtpyBase.AfApiError as exc:
+                if exc.status_code == 404:  # A profile without properties
+                    continue
+                raise
+            if props.get("worker"):
+                ret[profile_name] = props["worker"][0]
+        return ret
+
     def download_profile(self, profile_name, dest_folder):
         return self.download_file("profiles/{}".format(profile_name), dest_folder)
 
@@ -210,16 +484,31 @@ class MetaRepo(ArtifactoryRepo):
         return Build.loads(data)
 
 
+def _parse_date(date):
+    """The dates of Artifactory, ISO 8601 with the "Z" suffix for UTC"""
+    return datetime.fromisoformat(date.replace("Z", "+00:00"))
+
+
 class Artifactory(object):
 
     af: Rtpy
     url: str
 
+    health_ttl = float(os.getenv("CONAN_CI_HEALTH_TTL_SECONDS", "300"))
+
     def __init__(self, artifactory_url: str, username: str, password: str):
         self.url = artifactory_url
         settings = {"af_url": artifactory_url, "username": username, "password": password}
         self.af = Rtpy(settings)
-        self.af.system_and_configuration.system_health_ping()
+        share_session(self.af)
+        self._last_health_check = None
+
+    def check_health(self):
+        """Pings the server, at most once every 'health_ttl' seconds"""
+        now = time.time()
+        if self._last_health_check is None or now - self._last_health_check > self.health_ttl:
+            self.af.system_and_configuration.system_health_ping()
+            self._last_health_check = now
 
     def create_repo(self, name: str) -> ArtifactoryRepo:
         params = {"key": name, "rclass": "local", "packageType": "conan"}
@@ -233,7 +522,11 @@ class Artifactory(object):
         tmp = self.af.repositories.get_repositories()
         return [ArtifactoryRepo(r["url"], r["key"], self.af) for r in tmp]
 
-    def get_files_of_path(self, path):
+    aql_paths_chunk = 100
+
+    def get_files_of_paths(self, paths: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """The files (sha1, md5 and name) of every path, with one query for every
+        'aql_paths_chunk' paths. The paths without files have an empty list"""
 
         def _not_repeated(sha1, a_list):
             for ell in a_list:
@@ -241,19 +534,55 @@ class Artifactory(object):
                     return False
             return True
 
-        q = 'items.find({"path": "%s"})' \
-            '.include("repo", "name", "path", "actual_md5", "actual_sha1")' % path
-
-        ret_data = self.af.searches.artifactory_query_language(q)
+        ret = {path: [] for path in paths}
+        paths = list(ret)
+        for i in range(0, len(paths), self.aql_paths_chunk):
+            chunk = paths[i:i + self.aql_paths_chunk]
+            criteria = {"$or": [{"path": path} for path in chunk]}
+            q = 'items.find({})' \
+                '.include("repo", "name", "path", "actual_md5", "actual_sha1")' \
+                .format(json.dumps(criteria))
+
+            with span("artifactory.aql", paths=len(chunk)):
+                ret_data = self.af.searches.artifactory_query_language(q)
+
+            for res in ret_data["results"]:
+                if res["name"] in [".timestamp"]:
+                    continue
+                files = ret.get(res["path"])
+                if files is not None and _not_repeated(res["actual_sha1"], files):
+                    el = {"sha1": res["actual_sha1"], "md5": res["actual_md5"],
+                          "name": res["name"]}
+                    files.append(el)
+        return ret
 
-        ret = []
+    def find_package_revisions(self, repos_names: List[str],
+                               packages_paths: List[str]) -> Dict[str, Tuple[str, str]]:
+        """The latest package revision already uploaded to any of the repos for every
+        package path (user/name/version/channel/rrev/package/package_id) and the repo with
+        it, the first one of 'repos_names' if in several, with a single query. The paths
+        without any revision are not in the returned dict"""
+        if not packages_paths or not repos_names:
+            return {}
+        criteria = {"$and": [{"$or": [{"repo": name} for name in repos_names]},
+                             {"$or": [{"path": {"$match": "{}/*".format(path)}}
+                                      for path in packages_paths]},
+                             {"name": "conanmanifest.txt"}]}
+        q = 'items.find({}).include("repo", "path", "created")'.format(json.dumps(criteria))
+        with span("artifactory.aql", packages=len(packages_paths)):
+            ret_data = self.af.searches.artifactory_query_language(q)
+
+        order = {name: index for index, name in enumerate(repos_names)}
+        latest = {}
         for res in ret_data["results"]:
-            if res["name"] in [".timestamp"]:
-                continue
-            if _not_repeated(res["actual_sha1"], ret):
-                el = {"sha1": res["actual_sha1"], "md5": res["actual_md5"], "name": res["name"]}
-                ret.append(el)
-        return ret
+            path, prev = res["path"].rsplit("/", 1)
+            current = latest.get(path)
+            if current and current[1] == prev:  # Promoted, the same revision in other repo
+                if order[res["repo"]] < order[current[2]]:
+                    latest[path] = (current[0], prev, res["repo"])
+            elif not current or res["created"] > current[0]:
+                latest[path] = (res["created"], prev, res["repo"])
+        return {path: (prev, repo) for path, (_, prev, repo) in latest.items()}
 
     def publish_build_info(self, bi):
         # Not implemented in the library
@@ -289,3 +618,22 @@ class Artifactory(object):
         except Exception as e:
             print(e)
             raise
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+# sha1 of the contents last deployed by the process to every url
+_deployed = {}
+
+
+def get_artifactory(artifactory_url: str, username: str, password: str) -> Artifactory:
+    """The Artifactory client of the process for the url and credentials, created once and
+    health checked lazily, instead of a new client (and ping) for every repo or job"""
+    key = (artifactory_url, username, password)
+    with _clients_lock:
+        art = _clients.get(key)
+        if art is None:
+            art = Artifactory(artifactory_url, username, password)
+            _clients[key] = art
+    art.check_health()
+    return art
@@ -0,0 +1,169 @@
+"""Benchmarks of the lockfile hot paths with generated lockfiles, no remote needed.
+
+    python -m conan_ci.benchmarks --sizes 1000 10000 --output results.json
+    python -m conan_ci.benchmarks --compare results.json
+
+The results are json, one entry per benchmark, shape and size, with the best and mean
+seconds of the repetitions, to compare them between releases.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+from conan_ci.build_info import BuildInfoBuilder, get_module_id, get_remote_path_from_pref, \
+    get_remote_path_from_ref
+from conan_ci.jobs.create_job import ConanCreateJob
+from conan_ci.model.lockfile import Lockfile
+from conan_ci.scheduler import BuildScheduler
+from conan_ci.simulation.graphs import SHAPES, lock_data
+from conan_ci.tools import tmp_folder
+
+PROFILE = "[settings]\narch=x86_64\nbuild_type=Release\ncompiler=gcc\n" \
+          "compiler.libcxx=libstdc++11\ncompiler.version=7\nos=Linux\n"
+
+
+class _ArtifactoryFiles(object):
+    """Answers get_files_of_paths as the Artifactory does, two files per path"""
+
+    @staticmethod
+    def get_files_of_paths(paths):
+        ret = {}
+        for path in paths:
+            sha1 = hashlib.sha1(path.encode()).hexdigest()
+            ret[path] = [{"sha1": sha1, "md5": sha1[:32], "name": "conan_package.tgz"},
+                         {"sha1": sha1[::-1], "md5": sha1[8:], "name": "conaninfo.txt"}]
+        return ret
+
+
+def benchmark_lock(shape, size):
+    """The lockfile of a project after its build: every library built but the base one,
+    the profile in the lockfile as Conan stores it"""
+    data = lock_data("project/1.0@conan/stable", SHAPES[shape](size))
+    nodes = data["graph_lock"]["nodes"]
+    for node_id, node in nodes.items():
+        if node["pref"] and node_id != str(len(nodes) - 1):
+            node["modified"] = "Build"
+    data["profile_host"] = PROFILE
+    return Lockfile(data)
+
+
+def _process_lockfile(lockfile: Lockfile, folder):
+    builder = BuildInfoBuilder(_ArtifactoryFiles())
+    builder.process_lockfile(os.path.join(folder, Lockfile.filename))
+    return builder
+
+
+def _merge_modules(lockfile: Lockfile, folder):
+    # The second profile of the same project merges the same modules
+    builder = _process_lockfile(lockfile, folder)
+    builder.process_lockfile(os.path.join(folder, Lockfile.filename))
+
+
+def _get_built_node_id(lockfile: Lockfile, folder):
+    ConanCreateJob.get_built_node_id(folder)
+
+
+def _get_docker_image(lockfile: Lockfile, folder):
+    ConanCreateJob.get_docker_image_from_lockfile(folder)
+
+
+def _parse_refs(lockfile: Lockfile, folder):
+    for node in lockfile.nodes.values():
+        pref = node["pref"]
+        if pref:
+            get_module_id(pref)
+            get_remote_path_from_ref(pref)
+            get_remote_path_from_pref(pref)
+
+
+def _build_order(lockfile: Lockfile, folder):
+    lockfile = Lockfile.load(folder)
+    lockfile.update_exported_ref("lib{}/1.0@conan/stable".format(len(lockfile.nodes) - 3),
+                                 "new")
+    for node in lockfile.nodes.values():
+        node.pop("modified", None)
+    scheduler = BuildScheduler(lockfile.data)
+    ready = scheduler.pop_ready()
+    while ready:
+        for node_id, _ in ready:
+            scheduler.node_ended(node_id)
+        ready = scheduler.pop_ready()
+
+
+BENCHMARKS = {"process_lockfile": _process_lockfile,
+              "merge_modules": _merge_modules,
+              "get_built_node_id": _get_built_node_id,
+              "get_docker_image_from_lockfile": _get_docker_image,
+              "parse_refs": _parse_refs,
+              "build_order": _build_order}
+
+
+def run_benchmarks(shapes, sizes, repeat=3, names=None):
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            lockfile = benchmark_lock(shape, size)
+            with tmp_folder() as folder:
+                lockfile.save(folder)
+                for name in names or BENCHMARKS:
+                    times = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        BENCHMARKS[name](lockfile, folder)
+                        times.append(time.perf_counter() - start)
+                    results.append({"benchmark": name, "shape": shape, "size": size,
+                                    "best": min(times), "mean": sum(times) / len(times)})
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results}
+
+
+def compare(baseline, current, threshold):
+    """The results slower than the baseline by more than 'threshold' (0.2 => 20%)"""
+    base = {(r["benchmark"], r["shape"], r["size"]): r["best"] for r in baseline["results"]}
+    ret = []
+    for result in current["results"]:
+        previous = base.get((result["benchmark"], result["shape"], result["size"]))
+        if previous and result["best"] > previous * (1 + threshold):
+            ret.append(dict(result, baseline=previous))
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the lockfile hot paths")
+    parser.add_argument("--shapes", nargs="+", default=["wide", "deep", "diamond"],
+                        choices=sorted(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Json file to write the results")
+    parser.add_argument("--compare", help="Json results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown over the --compare results considered a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.shapes, args.sizes, args.repeat, args.benchmarks)
+    output = json.dumps(results, indent=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for r in regressions:
+            sys.stderr.write("Regression {benchmark} {shape} {size}: {best:.4f}s "
+                             "(was {baseline:.4f}s)\n".format(**r))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
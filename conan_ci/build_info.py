@@ -1,6 +1,6 @@
 import json
 
-from conan_ci.artifactory import Artifactory
+from conan_ci.artifactory import Artifactory, MetaRepo
 from conan_ci.model.build import Build
 from conan_ci.tools import load, iso_now
 
@@ -47,11 +47,16 @@ def get_module_id(pref):
 class BuildInfoBuilder(object):
 
     art: Artifactory
+    meta: MetaRepo
 
-    def __init__(self, art: Artifactory):
+    def __init__(self, art: Artifactory, meta: MetaRepo = None):
+        """With a 'meta' repo, the files of the artifacts are also kept in its cache for the
+        next builds"""
         self.modules = {}
         self.art = art
+        self.meta = meta
         self.started = iso_now()
+        self._files = {}  # Files by remote path, shared by the profiles and projects
 
     def get_build_info(self, build: Build):
         ret = {"version": "1.0.1",
@@ -62,18 +67,31 @@ class BuildInfoBuilder(object):
                "modules": list(self.modules.values())}
         return ret
 
-    def _get_files_of_package(self, pref):
-        path = get_remote_path_from_pref(pref)
-        return self.art.get_files_of_path(path)
-
-    def _get_files_of_recipe(self, pref):
-        path = "{}/export".format(get_remote_path_from_ref(pref))
-        return self.art.get_files_of_path(path)
-
-    def _get_artifacts(self, pref, include_recipe=True):
-        ret = self._get_files_of_package(pref)
+    @staticmethod
+    def _artifacts_paths(pref, include_recipe=True):
+        paths = [get_remote_path_from_pref(pref)]
         if include_recipe:
-            ret.extend(self._get_files_of_recipe(pref))
+            paths.append("{}/export".format(get_remote_path_from_ref(pref)))
+        return paths
+
+    def _get_files_of_paths(self, paths):
+        """The paths have the revisions, so the files resolved once never change. The paths
+        without files (not uploaded yet) are queried again"""
+        missing = [path for path in dict.fromkeys(paths) if not self._files.get(path)]
+        if missing and self.meta is not None:
+            self._files.update(self.meta.get_artifacts_files(missing))
+            missing = [path for path in missing if not self._files.get(path)]
+        if missing:
+            files = self.art.get_files_of_paths(missing)
+            if self.meta is not None:
+                self.meta.store_artifacts_files(files)
+            self._files.update(files)
+        return self._files
+
+    def _get_artifacts(self, pref, files, include_recipe=True):
+        ret = []
+        for path in self._artifacts_paths(pref, include_recipe):
+            ret.extend(files[path])
         return ret
 
     def _merge_modules(self, modules):
@@ -93,25 +111,32 @@ class BuildInfoBuilder(object):
         contents = load(lockfile_path)
         bi_modules = {}
         data = json.loads(contents)
+        nodes = data["graph_lock"]["nodes"]
+
+        # The files of all the artifacts are resolved together, instead of a query per path
+        built = [node["pref"] for node in nodes.values() if node.get("modified")]
+        modules_ids = set(get_module_id(pref) for pref in built)
+        dependents = [node["pref"] for node in nodes.values() if not node.get("modified") and
+                      any(get_module_id(r) in modules_ids for r in node.get("requires", []))]
+        paths = [path for pref in built + dependents for path in self._artifacts_paths(pref)]
+        files = self._get_files_of_paths(paths)
 
         # First iteration, create the modules
-        for node_id, node in data["graph_lock"]["nodes"].items():
-            if node.get("modified"):
-                pref = node["pref"]
-                # This node has been created
-                module = {"id": get_module_id(pref),
-                          "artifacts": self._get_artifacts(pref),
-                          "dependencies": []}
-                bi_modules[module["id"]] = module
+        for pref in built:
+            # This node has been created
+            module = {"id": get_module_id(pref),
+                      "artifacts": self._get_artifacts(pref, files),
+                      "dependencies": []}
+            bi_modules[module["id"]] = module
 
         # Second iteration, build the dependencies
-        for node_id, node in data["graph_lock"]["nodes"].items():
+        for node_id, node in nodes.items():
             if not node.get("modified"):
                 pref = node["pref"]
                 for require_ref in node.get("requires", []):
                     module_id = get_module_id(require_ref)
                     if module_id in bi_modules:
-                        bi_modules[module_id]["dependencies"] = self._get_artifacts(pref)
+                        bi_modules[module_id]["dependencies"] = self._get_artifacts(pref, files)
 
         self._merge_modules(bi_modules)
 
@@ -2,9 +2,9 @@ import json
 import os
 from typing import Dict
 
-import requests
-
+from conan_ci.dispatcher import default_worker_class
 from conan_ci.model.build_create_info import BuildCreateInfo
+from conan_ci.sessions import get_session
 
 
 class TravisCIAdapter(object):
@@ -31,26 +31,23 @@ class TravisAPICaller(object):
         self.repo_slug = repo_slug.replace("/", "%2F")
         self.travis_token = travis_token
 
-    def _repeated_node_id(self, node_id):
+    def _repeated_node(self, create_info: BuildCreateInfo):
         for d in [self._run_processes, self._end_processes]:
-            for _, create_info in d.items():
-                if create_info.node_info.id == node_id:
+            for _, launched in d.items():
+                if launched.node_info.id == create_info.node_info.id and \
+                        launched.build_conf == create_info.build_conf:
                     return True
         return False
 
     def call_build(self, create_info: BuildCreateInfo):
 
-        if self._repeated_node_id(create_info.node_info.id):
+        if self._repeated_node(create_info):
             print("Already launched: {}".format(create_info.node_info.id))
             return
 
         env = {"CONAN_CI_BUILD_JSON": json.dumps(create_info.dumps())}
 
-        slave = ""
-        if "linux" in create_info.build_conf.profile_name:
-            slave = "linux"
-        if "windows" in create_info.build_conf.profile_name:
-            slave = "windows"
+        slave = create_info.worker or default_worker_class(create_info.build_conf.profile_name)
 
         env_str = " ".join(["{}={}".format(k, v) for k, v in env.items()])
         data = {
@@ -65,16 +62,28 @@ class TravisAPICaller(object):
                  }
                }
             }
-
-        ret = requests.post("https://api.travis-ci.org/repo/{}/requests".format(self.repo_slug),
-                            headers=self._auth_headers(), json=data)
+        if create_info.notify_url:
+            # Travis also notifies the end of the job, even if the job could not notify it
+            data["request"]["config"]["notifications"] = {
+                "webhooks": {"urls": [create_info.notify_url],
+                             "on_success": "always",
+                             "on_failure": "always"}}
+
+        ret = get_session().post("https://api.travis-ci.org/repo/{}/"
+                                 "requests".format(self.repo_slug),
+                                 headers=self._auth_headers(), json=data)
         if ret.ok:
             data_response = ret.json()
             request_id = data_response["request"]["id"]
+            create_info.running_id = request_id
             self._run_processes[request_id] = create_info
         else:
             raise Exception(ret)
 
+    def attach(self, create_info: BuildCreateInfo):
+        """Keeps checking a request launched before, by a coordinator that was stopped"""
+        self._run_processes[create_info.running_id] = create_info
+
     def _auth_headers(self):
         headers = {"Authorization": "token {}".format(self.travis_token),
                    "Travis-API-Version": "3",
@@ -83,9 +92,9 @@ class TravisAPICaller(object):
 
     def check_ended(self):
 
-        ret = requests.get("https://api.travis-ci.org/repo/{}/"
-                           "requests".format(self.repo_slug),
-                           headers=self._auth_headers())
+        ret = get_session().get("https://api.travis-ci.org/repo/{}/"
+                                "requests".format(self.repo_slug),
+                                headers=self._auth_headers())
         if not ret.ok:
             raise Exception("Error checking status: {}".format(ret))
         data = ret.json()
@@ -0,0 +1,61 @@
+import os
+import shutil
+
+from conan_ci.runner import run
+from conan_ci.tools import environment_append, chdir, load
+from conan_ci.tracing import span
+
+READ_REMOTE = "central_remote"
+UPLOAD_REMOTE = "upload_remote"
+
+
+class ConanHome(object):
+    """A CONAN_USER_HOME configured only once (package_id_mode, remotes and credentials)
+    to run all the Conan commands of the coordinator"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.upload_remote = READ_REMOTE
+
+    def run(self, command, ignore_failure=False):
+        with environment_append({"CONAN_USER_HOME": self.folder}):
+            return run(command, ignore_failure=ignore_failure)
+
+    def setup(self, read_url, write_url):
+        with span("conan.remote_setup"):
+            self._setup(read_url, write_url)
+
+    def _setup(self, read_url, write_url):
+        self.run('conan config set general.default_package_id_mode=package_revision_mode')
+        self.run('conan remote remove conan-center', ignore_failure=True)
+        self.run('conan remote add {} {} --force'.format(READ_REMOTE, read_url))
+        self.run('conan user -r {} -p'.format(READ_REMOTE))
+        if read_url != write_url:
+            # Only used explicitly for the uploads, the locks are computed with the read remote
+            # because we don't want to get stuff from other PRs
+            self.run('conan remote add {} {} --force'.format(UPLOAD_REMOTE, write_url))
+            self.run('conan user -r {} -p'.format(UPLOAD_REMOTE))
+            self.upload_remote = UPLOAD_REMOTE
+
+    def remove(self, pattern):
+        self.run('conan remove "{}" -f'.format(pattern), ignore_failure=True)
+
+    def clone(self, folder):
+        """New home with the same configuration, without the packages in the cache"""
+        src = os.path.join(self.folder, ".conan")
+        shutil.copytree(src, os.path.join(folder, ".conan"),
+                        ignore=lambda path, names: ["data"] if path == src else [])
+        ret = ConanHome(folder)
+        ret.upload_remote = self.upload_remote
+        return ret
+
+    def graph_lock(self, project_ref, profile_path, lock_folder):
+        """Computes the project lock in 'lock_folder' and returns its contents. It only
+        depends on this home and the folder, so it can run in a process of a pool"""
+        # To calculate the first lock only, the dev repo, we don't want to get
+        # stuff from other PRs
+        with chdir(lock_folder), span("conan.graph_lock", project=project_ref,
+                                      profile=os.path.basename(profile_path)):
+            self.run("conan graph lock {} --profile {} "
+                     "-r {}".format(project_ref, profile_path, READ_REMOTE))
+        return load(os.path.join(lock_folder, "conan.lock"))
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict
+
+
+def sha1_of(contents: bytes):
+    return hashlib.sha1(contents).hexdigest()
+
+
+def sha1_of_file(path, chunk_size=1024 * 1024):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class DiskCache(object):
+    """Files by key in a folder, shared by the processes of the machine (coordinator and
+    jobs). When the folder exceeds 'max_bytes' the least recently used files are removed"""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._size = None  # Estimated bytes in the folder, it is only listed when exceeded
+
+    @staticmethod
+    def from_env():
+        """CONAN_CI_CACHE_FOLDER and CONAN_CI_CACHE_MB, None (no cache) with 0 MB"""
+        max_mb = float(os.getenv("CONAN_CI_CACHE_MB", "256"))
+        if not max_mb:
+            return None
+        folder = os.getenv("CONAN_CI_CACHE_FOLDER",
+                           os.path.join(os.path.expanduser("~"), ".conan_ci", "cache"))
+        return DiskCache(folder, int(max_mb * 1024 * 1024))
+
+    def _path(self, key):
+        return os.path.join(self.folder, sha1_of(key.encode()))
+
+    def get(self, key):
+        """The contents if cached, None otherwise"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                contents = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            os.utime(path)  # Recently used
+        except OSError:
+            pass
+        return contents
+
+    def get_path(self, key):
+        """The path of the cached file, to copy it without loading it, None if not cached"""
+        path = self._path(key)
+        try:
+            os.utime(path)  # Recently used
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, contents: bytes):
+        self.put_many({key: contents})
+
+    def put_many(self, items: Dict[str, bytes]):
+        """Several files, with a single eviction pass"""
+        os.makedirs(self.folder, exist_ok=True)
+        for key, contents in items.items():
+            fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_path, self._path(key))  # Other processes never read a partial file
+        self._added(sum(len(contents) for contents in items.values()))
+
+    def put_file(self, key, file_path):
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=".tmp")
+        os.close(fd)
+        shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, self._path(key))
+        self._added(os.path.getsize(file_path))
+
+    def clear(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self._size = 0
+
+    def _added(self, size):
+        """The replaced files and the ones of other processes are not known, the estimation
+        is corrected listing the folder when it looks exceeded"""
+        if self._size is None:
+            self._evict()
+        else:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Down to 80% of the max, not to list the folder again in the next put"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            if name.startswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:  # Removed by other process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            self._size = total
+            return
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes * 0.8:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+            total -= size
+        self._size = total
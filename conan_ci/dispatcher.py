@@ -0,0 +1,78 @@
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from conan_ci.model.build_create_info import BuildCreateInfo
+
+DEFAULT_WORKER = "default"
+
+
+def default_worker_class(profile_name):
+    """Worker class of a profile without a 'worker' label, from its name"""
+    if "windows" in profile_name:
+        return "windows"
+    if "linux" in profile_name:
+        return "linux"
+    return DEFAULT_WORKER
+
+
+class Dispatcher(object):
+    """Sits between the coordinator and a CI caller. Every job is routed to a worker class,
+    from the 'worker' label of its profile, and at most 'limits[worker]' jobs of every class
+    run at the same time, the rest wait in a ready queue (higher priority first) until a job
+    of its class ends. The DEFAULT_WORKER limit applies to the classes without their own
+    limit, without any of them the jobs are launched immediately"""
+
+    limits: Dict[str, int]
+    profile_workers: Dict[str, str]
+
+    def __init__(self, ci_caller, limits=None, profile_workers=None, clock=time.time):
+        self.ci_caller = ci_caller
+        self.clock = clock
+        self.limits = limits or {}
+        self.profile_workers = profile_workers or {}
+        self._queues = defaultdict(list)
+        self._running = defaultdict(int)
+        self._counter = itertools.count()  # FIFO for the same priority
+
+    def worker_class(self, create_info: BuildCreateInfo):
+        profile_name = create_info.build_conf.profile_name
+        return self.profile_workers.get(profile_name) or default_worker_class(profile_name)
+
+    def limit(self, worker):
+        return self.limits.get(worker, self.limits.get(DEFAULT_WORKER))
+
+    def call_build(self, create_info: BuildCreateInfo):
+        create_info.worker = self.worker_class(create_info)
+        heapq.heappush(self._queues[create_info.worker],
+                       (-create_info.priority, next(self._counter), create_info))
+        self._release()
+
+    def attach(self, create_info: BuildCreateInfo):
+        create_info.worker = self.worker_class(create_info)
+        self._running[create_info.worker] += 1
+        self.ci_caller.attach(create_info)
+
+    def _release(self):
+        for worker, queue in self._queues.items():
+            limit = self.limit(worker)
+            while queue and (not limit or self._running[worker] < limit):
+                _, _, create_info = heapq.heappop(queue)
+                self._running[worker] += 1
+                create_info.started = self.clock()  # Not the time waiting for a worker
+                self.ci_caller.call_build(create_info)
+
+    def check_ended(self) -> List[BuildCreateInfo]:
+        ended = self.ci_caller.check_ended()
+        for create_info in ended:
+            self._running[create_info.worker] -= 1
+        self._release()
+        return ended
+
+    def queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def empty_queue(self):
+        return self.ci_caller.empty_queue() and not self.queued()
@@ -3,20 +3,28 @@ import os
 import re
 import shutil
 import tempfile
-from typing import List
-
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Tuple
 
 from conan_ci.artifactory import Artifactory
-from conan_ci.build_info import BuildInfoBuilder
+from conan_ci.build_info import BuildInfoBuilder, get_remote_path_from_ref
+from conan_ci.conan_home import ConanHome
+from conan_ci.dispatcher import Dispatcher
 from conan_ci.json_logger import JsonLogger
 from conan_ci.model.build import Build
 from conan_ci.model.build_configuration import BuildConfiguration
 from conan_ci.model.build_create_info import BuildCreateInfo
+from conan_ci.model.checkpoint import NodeChainCheckpoint, RunningNode
+from conan_ci.model.lockfile import Lockfile
 from conan_ci.model.node_info import NodeInfo
+from conan_ci.model.node_status import NodeStatus
 from conan_ci.model.repos_build import ReposBuild
-from conan_ci.runner import run
-from conan_ci.tools import environment_append, cur_folder, load
+from conan_ci.notifications import AdaptivePoller, CompletionWebhook
+from conan_ci.scheduler import BuildScheduler, pref_has_prev
+from conan_ci.tools import environment_append, cur_folder
+from conan_ci.tracing import Tracer, activate, span
 from conan_ci.tools import tmp_folder
 
 
@@ -43,11 +51,14 @@ class CoordinatorJob(object):
     repos: ReposBuild
     art: Artifactory
 
-    def __init__(self, ci_adapter, ci_caller, logger: JsonLogger, repos: ReposBuild):
+    def __init__(self, ci_adapter, ci_caller, logger: JsonLogger, repos: ReposBuild,
+                 resume=None):
 
         self.logger = logger
         self.ci_adapter = ci_adapter
         self.ci_caller = ci_caller
+        # Continue from the checkpoint of the build, if any, when the job is restarted
+        self.resume = resume if resume is not None else bool(os.getenv("CONAN_CI_RESUME"))
 
         self.repos = repos
         self.art = self.repos.meta.get_artifactory()
@@ -86,7 +97,7 @@ class CoordinatorJob(object):
 
         self.repos.meta.store_build_pr_association(build, current_slug, pr_number)
 
-        job = NodeChain(build, self.repos, self.ci_caller, self.logger)
+        job = NodeChain(build, self.repos, self.ci_caller, self.logger, self.resume)
         job.run()
 
     def run_merge(self, pr_number):
@@ -110,17 +121,10 @@ class CoordinatorJob(object):
         build = Build(build_name, build_number)
         repos = ReposBuild(self.repos.read, self.repos.read, self.repos.meta)
 
-        job = NodeChain(build, repos, self.ci_caller, self.logger)
+        job = NodeChain(build, repos, self.ci_caller, self.logger, self.resume)
         job.run()
-
-        # Store the lockfiles for the build
-        #with tmp_folder() as t:
-        #    profiles_names = self.repos.meta.get_profile_names()
-        #    projects_refs = self.repos.meta.get_projects_refs()
-        #    for project_ref in projects_refs:
-        #        for profile_name in profiles_names:
-        #            repos.meta.download_node_lock(t)
-        #            repos.meta.store_last_repo_lock(self.dev_repo_name, t, profile_name)
+        # The locks of the regular builds tell which projects are affected by a change
+        job.store_last_locks()
 
 
 class NodeChain(object):
@@ -128,47 +132,184 @@ class NodeChain(object):
     build: Build
     repos: ReposBuild
     art: Artifactory
-
-    def __init__(self, build: Build, repos: ReposBuild, ci_caller, logger):
+    _schedulers: Dict[BuildConfiguration, BuildScheduler]
+    _project_locks: Dict[BuildConfiguration, Lockfile]
+    _running: Dict[Tuple[BuildConfiguration, str], BuildCreateInfo]
+    download_threads = int(os.getenv("CONAN_CI_DOWNLOAD_THREADS", "8"))
+    # A resumed build launches again the nodes launched after the last checkpoint
+    checkpoint_seconds = float(os.getenv("CONAN_CI_CHECKPOINT_SECONDS", "30"))
+
+    def __init__(self, build: Build, repos: ReposBuild, ci_caller, logger, resume=False):
         self.ci_caller = ci_caller
+        self.dispatcher = Dispatcher(ci_caller)
         self.repos = repos
         self.checkout_folder = cur_folder()
-        self._launched_nodes_ids = []
+        self.conan_home = ConanHome(os.getenv("CONAN_USER_HOME", self.checkout_folder))
+        self._launched_nodes_ids = set()
+        self._schedulers = {}
+        self._project_locks = {}
+        self._running = {}
+        self._running_paths = {}  # The node path in the meta repo => key of _running
+        self._statuses = {}  # Files found so far of the running nodes
+        self._status_since = None
+        self._failed = defaultdict(list)
+        self._skipped = defaultdict(list)  # Not marked as built in the locks, see _resume
+        self._checkpoint_time = None
+        self._checkpoint_forced = False  # Something a resumed build couldn't tell        # Same package (see _package_key) of different projects, built once
+        self._package_owners = {}
+        self._package_keys = {}
+        self._package_followers = defaultdict(list)
+        self._built_packages = {}
+        self._published = []
+        self.clock = time.time  # The simulator replaces it with its virtual clock
+        self._durations = {}
+        self._durations_modified = False
+        self._projects_refs = []
+        self._profiles_names = []
+        self.resume = resume
         self.logger = logger
         self.build = build
         self.art = repos.read.get_artifactory()
+        self.poller = AdaptivePoller.from_env()
+        self.webhook = CompletionWebhook.from_env(self.poller)
+        self.tracer = Tracer()
+        self.trace_file = os.getenv("CONAN_CI_TRACE_FILE")
 
     def run(self):
-        builder = BuildInfoBuilder(self.art)
+        if self.webhook:
+            self.webhook.start()
+        try:
+            with activate(self.tracer), span("node_chain.run", build=self.build.name):
+                self._run()
+        finally:
+            if self.webhook:
+                self.webhook.stop()
+            print(self.tracer.summary())
+            if self.trace_file:
+                self.tracer.save(self.trace_file)
+            # Also the durations of the jobs ended before a failure
+            if self._durations_modified:
+                self.repos.meta.store_build_durations(self._durations)
+
+    def _run(self):
+        builder = BuildInfoBuilder(self.art, self.repos.meta)
         print(os.getcwd())
-        profiles_names = self.repos.meta.get_profile_names()
-        projects_refs = self.repos.meta.get_projects_refs()
-        # TODO: We should do here the same than c3i, infos to calculate
-        #  different package id?
-        #  conan info <ref> -if=<path_to_lock> --use-lock --json
+        self._durations = self.repos.meta.get_build_durations()
+        checkpoint = self.repos.meta.get_checkpoint(self.build) if self.resume else None
+        if checkpoint:
+            self._projects_refs = checkpoint.projects_refs
+            self._profiles_names = checkpoint.profiles_names
+            self._configure_dispatcher()
+            self._resume(checkpoint, builder)
+        else:
+            self.repos.meta.remove_build_files(self.build)
+            self.conan_home.setup(self.repos.read.url, self.repos.write.url)
+            self._profiles_names = self.repos.meta.get_profile_names()
+            self._projects_refs = self.repos.meta.get_projects_refs()
+            self._configure_dispatcher()
+            # TODO: We should do here the same than c3i, infos to calculate
+            #  different package id?
+            #  conan info <ref> -if=<path_to_lock> --use-lock --json
+            reference, rrev = self._export_modified_recipe()
+            with span("node_chain.impact_analysis", ref=reference):
+                self._projects_refs = self._impacted_projects(reference)
+            build_confs = [BuildConfiguration(project_ref, profile_name)
+                           for project_ref in self._projects_refs
+                           for profile_name in self._profiles_names]
+            for build_conf, lockfile in self._compute_locks(build_confs).items():
+                # The lockfile is modified with the new RREV of the node being modified
+                lockfile.update_exported_ref(reference, rrev)
+                self._queue_modified_node(build_conf, lockfile)
+            self._launch_ready_nodes(build_confs)
+        profiles_names = self._profiles_names
+        self._store_checkpoint(force=True)
+
+        # While there are jobs pending for any project...
+        print("Waiting for all jobs to be completed...")
+        pending_projects = [p for p in self._projects_refs if p not in self._published]
+        pending_projects = self._publish_finished_projects(builder, pending_projects,
+                                                           profiles_names)
+        while not self.dispatcher.empty_queue():
+            ended = self.process_ended_nodes()
+            pending_projects = self._publish_finished_projects(builder, pending_projects,
+                                                               profiles_names)
+            if ended:
+                self._store_checkpoint()
+            # Do not consume api calls limit checking, a job end notification wakes it up
+            if not self.dispatcher.empty_queue():
+                with span("node_chain.wait"):
+                    self.poller.wait(found_ended=bool(ended))
+
+        for project_ref in pending_projects:
+            self._publish_build_info(builder, project_ref, profiles_names)
+
+    @staticmethod
+    def _name_user_channel(ref):
+        """'name@user/channel' of a reference, a version bump is the same package for the
+        consumers with a version range"""
+        name_version, _, user_channel = ref.partition("@")
+        return "{}@{}".format(name_version.split("/")[0], user_channel)
+
+    def _impacted_projects(self, reference):
+        """The projects with the package (any version) in the last lock of any profile, or
+        never built. Only the references of the last locks are downloaded, not the locks"""
+        build_confs = [BuildConfiguration(project_ref, profile_name)
+                       for project_ref in self._projects_refs
+                       for profile_name in self._profiles_names]
+        with ThreadPoolExecutor(max_workers=self.download_threads) as executor:
+            all_refs = list(executor.map(self.repos.meta.get_last_project_refs, build_confs))
+
+        package = self._name_user_channel(reference)
+        impacted = set()
+        for build_conf, refs in zip(build_confs, all_refs):
+            if refs is None or package in {self._name_user_channel(ref) for ref in refs}:
+                impacted.add(build_conf.project_ref)
+        ret = [project_ref for project_ref in self._projects_refs if project_ref in impacted]
+        for project_ref in self._projects_refs:
+            if project_ref not in impacted:
+                print("The project {} doesn't depend on {}, skipping it".format(project_ref,
+                                                                              reference))
+        return ret
+
+    def store_last_locks(self):
+        for build_conf, lockfile in self._project_locks.items():
+            self.repos.meta.store_last_project_lock(lockfile, build_conf)
+
+    def _configure_dispatcher(self):
+        self.dispatcher.limits = self.repos.meta.get_worker_limits()
+        self.dispatcher.profile_workers = self.repos.meta.get_profile_workers(
+            self._profiles_names)
+
+    def _publish_finished_projects(self, builder, projects_refs, profiles_names):
+        """Publish the build info of the projects without pending nodes, returns the others"""
+        ret = []
         for project_ref in projects_refs:
-            for profile_name in profiles_names:
-                self._export_and_queue_modified_node(project_ref, profile_name)
-
-            # While there are jobs pending for the project...
-            print("Waiting for all jobs to be completed...")
-            while not self.ci_caller.empty_queue():
-                self.process_ended_nodes(project_ref)
-                delay_secs = int(os.getenv("CONAN_CI_CHECK_DELAY_SECONDS", "0"))
-                # Do not consume api calls limit checking
-                time.sleep(delay_secs)
-
-            # CALCULATE THE BUILD INFO
-            print("All jobs of the project completed!")
-            for profile_name in profiles_names:
-                with tmp_folder() as tmp_path:
-                    build_conf = BuildConfiguration(project_ref, profile_name)
-                    self.repos.meta.download_project_lock(tmp_path, self.build, build_conf)
+            if all(self._schedulers[BuildConfiguration(project_ref, profile_name)].finished()
+                   for profile_name in profiles_names):
+                self._publish_build_info(builder, project_ref, profiles_names)
+            else:
+                ret.append(project_ref)
+        return ret
+
+    def _process_build_info(self, builder: BuildInfoBuilder, project_ref, profiles_names):
+        for profile_name in profiles_names:
+            with tmp_folder() as tmp_path:
+                build_conf = BuildConfiguration(project_ref, profile_name)
+                self._project_locks[build_conf].save(tmp_path)
+                with span("build_info.process_lockfile", project=project_ref,
+                          profile=profile_name):
                     builder.process_lockfile(os.path.join(tmp_path, "conan.lock"))
 
-            bi = builder.get_build_info(self.build)
-            print(bi)
+    def _publish_build_info(self, builder: BuildInfoBuilder, project_ref, profiles_names):
+        # CALCULATE THE BUILD INFO
+        print("All jobs of the project {} completed!".format(project_ref))
+        self._process_build_info(builder, project_ref, profiles_names)
+
+        bi = builder.get_build_info(self.build)
+        print(bi)
+        with span("build_info.publish", project=project_ref):
             self.art.publish_build_info(bi)
+        self._published.append(project_ref)
 
     @staticmethod
     def _pref_to_ref(pref):
@@ -178,157 +319,438 @@ class NodeChain(object):
     def _pref_to_ref_with_rrev(pref):
         return pref.split(":")[0]
 
-    def _call_build(self, build_conf: BuildConfiguration, node_info: NodeInfo):
-        self.logger.add_node_building(node_info)
-        self._launched_nodes_ids.append(node_info.id)
-        create_info = BuildCreateInfo(self.build, build_conf, node_info, self.repos, self.logger)
-        self.ci_caller.call_build(create_info)
-
-    def _export_and_queue_modified_node(self, project_ref, profile_name):
-        build_conf = BuildConfiguration(project_ref, profile_name)
-
-        with tmp_folder() as tmp_path:
-            # Generate and upload the lock file for the project
-            profile_path = self.repos.meta.download_profile(profile_name, tmp_path)
-
-            # To calculate the first lock only, the dev repo, we don't want to get
-            # stuff from other PRs
-            run('conan config set general.default_package_id_mode=package_revision_mode')
-            run('conan remote remove conan-center', ignore_failure=True)
-            run('conan remote add central_remote {}'.format(self.repos.read.url))
-            run('conan user -r central_remote -p')
-            run("conan graph lock {} --profile {}".format(project_ref, profile_path))
-            print("LOCK DESPUES DE CONAN GRAPH LOCK")
-            self.print_lock(tmp_path)
-
-            # Get the reference of the node being modified
-            # The lockfile is modified with the new RREV
-            name, version = self.inspect_name_and_version(self.checkout_folder)
-            reference = "{}/{}@conan/stable".format(name, version)
-            run("conan export {} {} --lockfile {}".format(self.checkout_folder, reference,
-                                                          tmp_path))
-
-            print("LOCK DESPUES DE EXPORT")
-            self.print_lock(tmp_path)
-
-            # Now we can add the other remote, the revisions are freeze already
-            if self.repos.read.url != self.repos.write.url:
-                run('conan remote add upload_remote {}'.format(self.repos.write.url))
-                run('conan user -r upload_remote -p')
-                run('conan upload {} -r upload_remote'.format(reference))
-            else:
-                # In a dev build, not a PR
-                run('conan upload {} -r central_remote'.format(reference))
-
-            data = load(os.path.join(tmp_path, "conan.lock"))
-            self.logger.add_graph(self.build, build_conf, json.loads(data))
-
-            # Get the nodes corresponding to the ref being modified
-            # And queue all of them if they have been modified (no modified => FF)
-            to_launch = self._get_first_group_to_build(tmp_path)
+    def _create_info(self, build_conf: BuildConfiguration, node_info: NodeInfo):
+        notify_url = self.webhook.url if self.webhook else None
+        return BuildCreateInfo(self.build, build_conf, node_info, self.repos, self.logger,
+                               notify_url)
 
-            self.repos.meta.store_project_lock(tmp_path, self.build, build_conf)
-            for new_node_id, new_pref in to_launch:
-                new_ref = self._pref_to_ref(new_pref)
-                print("::::::: Launching {} ({}) at the start"
-                      " because it is missing".format(new_ref, profile_name, new_ref))
-                node_info = NodeInfo(new_node_id, new_ref)
-                self._call_build(build_conf, node_info)
-
-            # Clear generated packages
-            run('conan remove "*" -f')
-
-    @staticmethod
-    def print_lock(lock_folder):
-        print(load(os.path.join(lock_folder, "conan.lock")))
+    def _call_build(self, build_conf: BuildConfiguration, node_info: NodeInfo, priority=0):
+        self.logger.add_node_building(node_info)
+        self._launched_nodes_ids.add((build_conf, node_info.id))
+        create_info = self._create_info(build_conf, node_info)
+        create_info.priority = priority
+        self._add_running(create_info)
+        self.dispatcher.call_build(create_info)
+
+    def _add_running(self, create_info: BuildCreateInfo):
+        key = (create_info.build_conf, create_info.node_info.id)
+        self._running[key] = create_info
+        path = self.repos.meta.node_path(self.build, create_info.build_conf,
+                                         create_info.node_info)
+        self._running_paths[path] = key
+
+    def _pop_running(self, create_info: BuildCreateInfo) -> NodeStatus:
+        """Removes the ended node, returns its status"""
+        key = (create_info.build_conf, create_info.node_info.id)
+        self._running.pop(key, None)
+        self._running_paths.pop(self.repos.meta.node_path(self.build, create_info.build_conf,
+                                                          create_info.node_info), None)
+        return self._statuses.pop(key, None) or NodeStatus()
+
+    def _export_modified_recipe(self):
+        """Exports and uploads the recipe being modified, only once for all the locks"""
+        name, version = self.inspect_name_and_version(self.checkout_folder)
+        reference = "{}/{}@conan/stable".format(name, version)
+        with span("conan.export", ref=reference):
+            output = self.conan_home.run("conan export {} {}".format(self.checkout_folder,
+                                                                     reference))
+        match = re.search(r"Exported revision: (\w+)", output)
+        if not match:
+            raise Exception("The recipe revision of {} is not in the 'conan export' "
+                            "output:\n{}".format(reference, output))
+        rrev = match.group(1)
+        with span("conan.upload", ref=reference):
+            self.conan_home.run('conan upload {} -r {}'.format(reference,
+                                                               self.conan_home.upload_remote))
+        # Clear the exported recipe, the locks have to be computed with the remote one (as in
+        # the cloned homes of the parallel locks) and patched with update_exported_ref
+        self.conan_home.remove(reference)
+        return reference, rrev
+
+    def _compute_locks(self, build_confs: List[BuildConfiguration]):
+        processes = int(os.getenv("CONAN_CI_LOCK_PROCESSES", "1"))
+        if processes > 1 and len(build_confs) > 1:
+            with span("conan.graph_lock_parallel", locks=len(build_confs),
+                      processes=processes):
+                return self._compute_locks_parallel(build_confs, processes)
+
+        ret = {}
+        for build_conf in build_confs:
+            with tmp_folder() as tmp_path:
+                profile_path = self.repos.meta.download_profile(build_conf.profile_name,
+                                                                tmp_path)
+                contents = self.conan_home.graph_lock(build_conf.project_ref, profile_path,
+                                                      tmp_path)
+                ret[build_conf] = Lockfile.loads(contents)
+        return ret
 
-    def process_ended_nodes(self, project_ref):
+    def _compute_locks_parallel(self, build_confs: List[BuildConfiguration], processes):
+        """Every lock is computed in a process with its own Conan home and folder"""
+        base_folder = tempfile.mkdtemp()
+        try:
+            futures = {}
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for index, build_conf in enumerate(build_confs):
+                    lock_folder = os.path.join(base_folder, str(index))
+                    os.makedirs(lock_folder)
+                    conan_home = self.conan_home.clone(os.path.join(lock_folder, "home"))
+                    profile_path = self.repos.meta.download_profile(build_conf.profile_name,
+                                                                    lock_folder)
+                    futures[build_conf] = executor.submit(conan_home.graph_lock,
+                                                          build_conf.project_ref,
+                                                          profile_path, lock_folder)
+                return {build_conf: Lockfile.loads(future.result())
+                        for build_conf, future in futures.items()}
+        finally:
+            shutil.rmtree(base_folder)
+
+    def _new_scheduler(self, build_conf: BuildConfiguration, lockfile: Lockfile,
+                       to_build=None, ended=None):
+        with span("node_chain.build_order", project=build_conf.project_ref,
+                  profile=build_conf.profile_name):
+            return BuildScheduler(lockfile.data, self._durations.get(build_conf.profile_name),
+                                  to_build, ended)
+
+    def _record_duration(self, create_info: BuildCreateInfo, status: NodeStatus):
+        """The seconds measured by the job, else since it was sent to the CI until now"""
+        seconds = status.build_seconds
+        if seconds is None:
+            if create_info.started is None:  # Attached after resuming
+                return
+            seconds = self.clock() - create_info.started
+        durations = self._durations.setdefault(create_info.build_conf.profile_name, {})
+        previous = durations.get(create_info.node_info.ref)
+        durations[create_info.node_info.ref] = (previous + seconds) / 2 if previous else seconds
+        self._durations_modified = True
+
+    def _queue_modified_node(self, build_conf: BuildConfiguration, lockfile: Lockfile):
+        print("LOCK DESPUES DE CONAN GRAPH LOCK")
+        print(lockfile.dumps())
+
+        self._project_locks[build_conf] = lockfile
+        self.logger.add_graph(self.build, build_conf, lockfile.data)
+
+        # Get the nodes corresponding to the ref being modified, they are launched
+        # (if they have been modified, no modified => FF) once all the locks are stored
+        self._schedulers[build_conf] = self._new_scheduler(build_conf, lockfile)
+        self.repos.meta.store_project_lockfile(lockfile, self.build, build_conf)
+
+    def process_ended_nodes(self):
         # print("Checking ended jobs...")
-        ended: List[BuildCreateInfo] = self.ci_caller.check_ended()
-
-        # Update the project lock files by merging the lock from all the ended jobs
+        with span("node_chain.check_ended"):
+            ended: List[BuildCreateInfo] = self.dispatcher.check_ended()
+        # The ones detected before from the meta repo were already processed
+        ended = [info for info in ended
+                 if (info.build_conf, info.node_info.id) in self._running]
+        # The meta repo also tells the jobs ended but not reported yet by the CI
+        updated = self._update_running_status()
+        ended_keys = {(info.build_conf, info.node_info.id) for info in ended}
+        ended.extend(self._running[key] for key in updated
+                     if key not in ended_keys and self._statuses[key].finished)
+        if not ended:
+            return ended
+
+        statuses = {}
         for build_create_info in ended:
-            # Clear generated packages
-            run('conan remove "*" -f')
-
             print("Processing ended job: {}-{}".format(build_create_info.node_info.ref,
                                                        build_create_info.build_conf.profile_name))
-            # Check status
-            status = self.repos.meta.get_status(build_create_info.build,
-                                                build_create_info.build_conf,
-                                                build_create_info.node_info)
-            if not status:
-                try:
+            key = (build_create_info.build_conf, build_create_info.node_info.id)
+            statuses[key] = self._pop_running(build_create_info)
+        failed, errors = self._check_ended_status(ended, statuses)
+        succeeded = [info for info in ended if info not in failed]
+
+        # Fold all the node locks into the in-memory project locks in one pass
+        with span("node_chain.download_node_locks", jobs=len(succeeded)):
+            node_locks = self._get_node_locks(succeeded)
+        modified_confs = []
+        for build_create_info, node_lock in zip(succeeded, node_locks):
+            build_conf = build_create_info.build_conf
+            node_id = build_create_info.node_info.id
+            self._project_locks[build_conf].update(node_lock)
+            self._schedulers[build_conf].node_ended(node_id)
+            self._record_duration(build_create_info,
+                                  statuses[(build_conf, build_create_info.node_info.id)])
+            if build_conf not in modified_confs:
+                modified_confs.append(build_conf)
+            # The other projects waiting for the same package reuse it
+            for follower_conf in self._package_built(build_conf, node_id,
+                                                     node_lock.nodes[node_id]["pref"]):
+                if follower_conf not in modified_confs:
+                    modified_confs.append(follower_conf)
+
+        # The jobs read the project lock, it has to be stored before launching them
+        with span("node_chain.store_locks", locks=len(modified_confs)):
+            for build_conf in modified_confs:
+                self.repos.meta.store_project_lockfile(self._project_locks[build_conf],
+                                                       self.build, build_conf)
+        if errors:
+            for build_create_info in failed:
+                key = (build_create_info.build_conf, build_create_info.node_info.id)
+                followers = self._package_followers.pop(self._package_keys.get(key), [])
+                for build_conf, node_id in [key] + followers:
+                    self._failed[build_conf].append(node_id)
+            self._store_checkpoint(force=True)
+            raise Exception("\n".join(errors))
+
+        self._launch_ready_nodes(modified_confs)
+        return ended
+
+    def _launch_ready_nodes(self, build_confs: List[BuildConfiguration]):
+        """The ready nodes of all the configurations, the ones in the longest remaining path
+        of the build first. The nodes with a binary already in the repos are not launched"""
+        to_launch = []
+        while build_confs:
+            ready = []
+            for build_conf in build_confs:
+                scheduler = self._schedulers[build_conf]
+                for new_node_id, new_pref in self._get_ready_nodes(build_conf):
+                    ready.append((scheduler.priority(new_node_id), build_conf, new_node_id,
+                                  new_pref))
+            skipped = self._skip_already_built(ready)
+            ready = [r for r in ready if (r[1], r[2]) not in skipped]
+            shared, reused = self._share_identical_nodes(ready)
+            to_launch.extend(r for r in ready if (r[1], r[2]) not in shared)
+            # Skipping or reusing a node can release its dependents
+            build_confs = list(OrderedDict.fromkeys(build_conf
+                                                    for build_conf, _ in skipped + reused))
+
+        to_launch.sort(key=lambda launch: -launch[0])
+        for priority, build_conf, new_node_id, new_pref in to_launch:
+            new_ref = self._pref_to_ref(new_pref)
+            print("::::::: Launching {} ({})".format(new_ref, build_conf.profile_name))
+            with span("node_chain.launch", ref=new_ref, profile=build_conf.profile_name):
+                self._call_build(build_conf, NodeInfo(new_node_id, new_ref), priority)
+
+    def _find_package_revisions(self,
+                                packages_paths: List[str]) -> Dict[str, Tuple[str, str]]:
+        repos_names = list(OrderedDict.fromkeys([self.repos.read.name, self.repos.write.name]))
+        return self.art.find_package_revisions(repos_names, packages_paths)
+
+    def _skip_already_built(self, ready) -> List[Tuple[BuildConfiguration, str]]:
+        """Looks for the binaries of the ready nodes with a known package id in the read and
+        write repos (an earlier build of the same recipe revision, for example), all in one
+        query. The found ones are locked to the existing package revision and count as
+        ended, the ones of the write repo are marked as built, so they are in the build info
+        and promoted with it. Returns the (build_conf, node_id) of the skipped nodes"""
+        candidates = {}
+        for _, build_conf, node_id, pref in ready:
+            if pref_has_prev(pref) or not self._schedulers[build_conf].has_final_package_id(
+                    node_id):
+                continue
+            package_id = pref.split(":", 1)[1]
+            path = "{}/package/{}".format(get_remote_path_from_ref(pref), package_id)
+            candidates[(build_conf, node_id)] = (pref, path)
+        if not candidates:
+            return []
+
+        prevs = self._find_package_revisions(sorted(set(p for _, p in candidates.values())))
+        skipped = []
+        for (build_conf, node_id), (pref, path) in candidates.items():
+            if path not in prevs:
+                continue
+            prev, repo = prevs[path]
+            print(":::::: Skipping already built node: {}#{} "
+                  "({}, {})".format(pref, prev, repo, build_conf.profile_name))
+            node = self._project_locks[build_conf].nodes[node_id]
+            node["pref"] = "{}#{}".format(pref, prev)
+            if repo != self.repos.read.name:
+                node["modified"] = "Build"
+            self._schedulers[build_conf].node_ended(node_id)
+            self._skipped[build_conf].append(node_id)
+            self._checkpoint_forced = True
+            skipped.append((build_conf, node_id))
+
+        # The jobs of the dependents read the package revision from the project lock
+        for build_conf in OrderedDict.fromkeys(build_conf for build_conf, _ in skipped):
+            self.repos.meta.store_project_lockfile(self._project_locks[build_conf],
+                                                   self.build, build_conf)
+        return skipped
+
+    def _package_key(self, build_conf: BuildConfiguration, node_id):
+        """The nodes with the same key build the same package. The package id of the lock is
+        not the final one if a dependency is built, so the key has the recipe revision, the
+        options and the package references of the dependencies, all of them already built
+        (with the final package id) when the node is ready"""
+        nodes = self._project_locks[build_conf].nodes
+        node = nodes[node_id]
+        requires = tuple(sorted(nodes[require]["pref"] for require in node.get("requires", [])))
+        return (build_conf.profile_name, self._pref_to_ref_with_rrev(node["pref"]),
+                node.get("options", ""), requires)
+
+    def _share_identical_nodes(self, ready):
+        """The first project to launch a package owns it, the same package of the other
+        projects waits for it (or takes it if already built) instead of being launched.
+        Returns the (build_conf, node_id) not to launch and the reused ones"""
+        shared = set()
+        reused = []
+        for _, build_conf, node_id, pref in ready:
+            key = self._package_key(build_conf, node_id)
+            owner = self._package_owners.setdefault(key, (build_conf, node_id))
+            if owner == (build_conf, node_id):
+                self._package_keys[owner] = key
+                continue
+            shared.add((build_conf, node_id))
+            if key in self._built_packages:
+                self._node_built_by_other(build_conf, node_id, self._built_packages[key])
+                reused.append((build_conf, node_id))
+            else:
+                print(":::::: Waiting for the same package in {} "
+                      "({})".format(owner[0].project_ref, pref))
+                self._package_followers[key].append((build_conf, node_id))
+
+        for build_conf in OrderedDict.fromkeys(build_conf for build_conf, _ in reused):
+            self.repos.meta.store_project_lockfile(self._project_locks[build_conf],
+                                                   self.build, build_conf)
+        return shared, reused
+
+    def _package_built(self, build_conf: BuildConfiguration, node_id, pref):
+        """Marks the followers of the built package as built, returns their build_confs"""
+        key = self._package_keys.get((build_conf, node_id))
+        if key is None:
+            return []
+        self._built_packages[key] = pref
+        ret = []
+        for follower_conf, follower_id in self._package_followers.pop(key, []):
+            self._node_built_by_other(follower_conf, follower_id, pref)
+            ret.append(follower_conf)
+        return ret
+
+    def _node_built_by_other(self, build_conf: BuildConfiguration, node_id, pref):
+        node = self._project_locks[build_conf].nodes[node_id]
+        node["pref"] = pref
+        node["modified"] = "Build"
+        self._schedulers[build_conf].node_ended(node_id)
+
+    def _update_running_status(self) -> List[Tuple[BuildConfiguration, str]]:
+        """Adds the files stored since the last scheduling tick to the status of the running
+        nodes, one query for all of them. Returns the keys of the updated nodes"""
+        with span("node_chain.check_status", jobs=len(self._running)):
+            statuses, self._status_since = self.repos.meta.get_nodes_status(self.build,
+                                                                            self._status_since)
+        ret = []
+        for path, status in statuses.items():
+            key = self._running_paths.get(path)
+            if key is None:  # Already processed, or the status of a job of a stopped run
+                continue
+            self._statuses.setdefault(key, NodeStatus()).update(status)
+            ret.append(key)
+        return ret
+
+    def _check_ended_status(self, ended: List[BuildCreateInfo], statuses):
+        failed = []
+        errors = []
+        for build_create_info in ended:
+            status = statuses[(build_create_info.build_conf, build_create_info.node_info.id)]
+            if not status.ok:
+                log = "No log generated"
+                if status.log:
                     log = self.repos.meta.get_log(build_create_info.build,
                                                   build_create_info.build_conf,
                                                   build_create_info.node_info)
-                except Exception:
-                    log = "No log generated"
-                raise Exception("The job '{}:{}' failed with "
-                                "error: {}".format(build_create_info.node_info.ref,
-                                                   build_create_info.build_conf.profile_name, log))
-
-            # Download the node lockfile
-            node_lock_folder = tempfile.mkdtemp()
-            project_lock_folder = tempfile.mkdtemp()
-
-            self.repos.meta.download_project_lock(project_lock_folder,
-                                                  build_create_info.build,
-                                                  build_create_info.build_conf)
-            self.repos.meta.download_node_lock(node_lock_folder,
-                                               build_create_info.build,
-                                               build_create_info.build_conf,
-                                               build_create_info.node_info)
-
-            # Update the project lock with the node lock and upload it
-            run("conan graph update-lock {} {}".format(project_lock_folder, node_lock_folder))
-            self.repos.meta.store_node_lock(project_lock_folder,
-                                            build_create_info.build,
-                                            build_create_info.build_conf,
-                                            build_create_info.node_info)
-
-            # Get new build order to iterate the new available nodes
-            # the cascade could be replaced with a RREV default mode for example
-            to_launch = self._get_first_group_to_build(project_lock_folder)
-            # The build-order can modify the graph with the resolved nodes, so store it
-            self.repos.meta.store_project_lock(project_lock_folder, self.build,
-                                               build_create_info.build_conf)
-            for new_node_id, new_pref in to_launch:
-                new_ref = self._pref_to_ref(new_pref)
-                print("::::::: Launching {} ({}) "
-                      "after {} ended".format(new_ref, build_create_info.build_conf.profile_name,
-                                              build_create_info.node_info.ref))
-                build_conf = BuildConfiguration(project_ref,
-                                                build_create_info.build_conf.profile_name)
-                node_info = NodeInfo(new_node_id, new_ref)
-                self._call_build(build_conf, node_info)
-
-            shutil.rmtree(node_lock_folder)
-            shutil.rmtree(project_lock_folder)
-
-    def _get_first_group_to_build(self, project_lock_folder):
-
-        run('conan graph build-order "{}" --json bo.json -b missing'.format(project_lock_folder))
-        with open("bo.json") as f:
-            groups = json.load(f)
+                failed.append(build_create_info)
+                errors.append("The job '{}:{}' failed with "
+                              "error: {}".format(build_create_info.node_info.ref,
+                                                 build_create_info.build_conf.profile_name, log))
+        return failed, errors
+
+    def _store_checkpoint(self, force=False):
+        """Stored at most every checkpoint_seconds, it has all the running nodes. The ended
+        ones are in the project locks, stored on every change"""
+        now = self.clock()
+        recent = (self._checkpoint_time is not None and
+                  now - self._checkpoint_time < self.checkpoint_seconds)
+        if recent and not force and not self._checkpoint_forced:
+            return
+        self._checkpoint_time = now
+        self._checkpoint_forced = False
+        with span("node_chain.checkpoint"):
+            self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        running = []
+        for create_info in self._running.values():
+            running_id = create_info.running_id
+            if not isinstance(running_id, (int, str)):  # Not an id, a process for example
+                running_id = None
+            running.append(RunningNode(create_info.build_conf, create_info.node_info, running_id))
+        to_build = {build_conf: scheduler.to_build
+                    for build_conf, scheduler in self._schedulers.items()}
+        checkpoint = NodeChainCheckpoint(self._projects_refs, self._profiles_names,
+                                         self._published, dict(self._failed), running,
+                                         to_build, dict(self._skipped))
+        self.repos.meta.store_checkpoint(self.build, checkpoint)
+
+    def _resume(self, checkpoint: NodeChainCheckpoint, builder: BuildInfoBuilder):
+        print("Resuming the build {}#{} from its checkpoint".format(self.build.name,
+                                                                   self.build.number))
+        for build_conf in checkpoint.build_confs:
+            lockfile = self.repos.meta.get_project_lock(self.build, build_conf)
+            self._project_locks[build_conf] = lockfile
+            # The skipped nodes have a package revision but no "modified", as the nodes not to
+            # build, so the lock alone doesn't tell which ones were ended or still to build
+            skipped = checkpoint.skipped.get(build_conf, [])
+            self._skipped[build_conf].extend(skipped)
+            self._schedulers[build_conf] = self._new_scheduler(
+                build_conf, lockfile, checkpoint.to_build.get(build_conf, []), skipped)
+
+        for project_ref in checkpoint.published:
+            self._process_build_info(builder, project_ref, checkpoint.profiles_names)
+            self._published.append(project_ref)
+
+        can_attach = hasattr(self.ci_caller, "attach")
+        for running in checkpoint.running:
+            if running.node_info.id in self._schedulers[running.build_conf].ended:
+                continue  # It was merged before stopping
+            if not can_attach or running.running_id is None:
+                # Launched again as a ready node, without the status of the stopped job
+                self.repos.meta.remove_node_files(self.build, running.build_conf,
+                                                  running.node_info)
+                continue
+            print("Attaching to running job: {} ({})".format(running.node_info.ref,
+                                                            running.build_conf.profile_name))
+            create_info = self._create_info(running.build_conf, running.node_info)
+            create_info.running_id = running.running_id
+            self._launched_nodes_ids.add((running.build_conf, running.node_info.id))
+            self._add_running(create_info)
+            key = self._package_key(running.build_conf, running.node_info.id)
+            self._package_owners[key] = (running.build_conf, running.node_info.id)
+            self._package_keys[(running.build_conf, running.node_info.id)] = key
+            self.dispatcher.attach(create_info)
+
+        for build_conf in checkpoint.build_confs:
+            for node_id in checkpoint.failed.get(build_conf, []):
+                print("Launching again the failed node {} ({})".format(node_id,
+                                                                      build_conf.profile_name))
+                pref = self._project_locks[build_conf].nodes[node_id]["pref"]
+                self.repos.meta.remove_node_files(self.build, build_conf,
+                                                  NodeInfo(node_id, self._pref_to_ref(pref)))
+        self._launch_ready_nodes(checkpoint.build_confs)
+
+    def _get_node_locks(self, ended: List[BuildCreateInfo]) -> List[Lockfile]:
+        def get_node_lock(build_create_info: BuildCreateInfo):
+            return self.repos.meta.get_node_lock(build_create_info.build,
+                                                 build_create_info.build_conf,
+                                                 build_create_info.node_info)
+
+        if len(ended) == 1:  # Most of the ticks, not worth a pool
+            return [get_node_lock(ended[0])]
+        with ThreadPoolExecutor(max_workers=self.download_threads) as executor:
+            return list(executor.map(get_node_lock, ended))
+
+    def _get_ready_nodes(self, build_conf: BuildConfiguration):
         ret = []
-        if groups:
-            first_group = groups[0]
-            for new_node_id, new_pref in first_group:
-                if new_node_id in self._launched_nodes_ids:
-                    print(":::::: Skipping already launched node: {}".format(new_pref))
-                else:
-                    ret.append([new_node_id, new_pref])
-
-        print("Lock despues de build-order")
-        self.print_lock(project_lock_folder)
-        print("First group: {}".format(ret))
+        for new_node_id, new_pref in self._schedulers[build_conf].pop_ready():
+            if (build_conf, new_node_id) in self._launched_nodes_ids:
+                print(":::::: Skipping already launched node: {}".format(new_pref))
+            else:
+                ret.append([new_node_id, new_pref])
+        print("Ready nodes: {}".format(ret))
         return ret
 
-    @staticmethod
-    def inspect_name_and_version(folder):
+    def inspect_name_and_version(self, folder):
         json_path = os.path.join(folder, "nv.json")
-        run("conan inspect {} -a name -a version --json {}".format(folder, json_path))
+        self.conan_home.run("conan inspect {} -a name -a version --json {}".format(folder,
+                                                                                   json_path))
         with open(json_path) as f:
             c = f.read()
         os.unlink(json_path)
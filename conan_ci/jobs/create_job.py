@@ -4,9 +4,10 @@ import re
 
 import time
 
-from conan_ci.artifactory import Artifactory
+from conan_ci.artifactory import get_artifactory
 from conan_ci.model.build_create_info import BuildCreateInfo
 from conan_ci.model.node_info import NodeInfo
+from conan_ci.notifications import notify_job_ended
 from conan_ci.runner import docker_runner, regular_runner
 from conan_ci.tools import load, environment_append, cur_folder
 
@@ -19,7 +20,7 @@ class ConanCreateJob(object):
         art_url = os.environ["ARTIFACTORY_URL"]
         art_user = os.environ["ARTIFACTORY_USER"]
         art_password = os.environ["ARTIFACTORY_PASSWORD"]
-        art = Artifactory(art_url, art_user, art_password)
+        art = get_artifactory(art_url, art_user, art_password)
 
         data = json.loads(os.environ["CONAN_CI_BUILD_JSON"])
         self.info = BuildCreateInfo.loads(art, data)
@@ -49,6 +50,13 @@ class ConanCreateJob(object):
         return None
 
     def run(self):
+        try:
+            self._run()
+        finally:
+            notify_job_ended(self.info.notify_url, {"build_conf": self.info.build_conf.dumps(),
+                                                    "node_info": self.info.node_info.dumps()})
+
+    def _run(self):
         # Home at the current dir
         with environment_append({"CONAN_USER_HOME": cur_folder()}):
             conan_home = os.path.join(cur_folder(), ".conan")
@@ -102,6 +110,7 @@ class ConanCreateJob(object):
                                                               build_folder,
                                                               self.info.node_info.ref,
                                                               build_folder)
+                started = time.time()
                 try:
                     output = runner.run(cmd)
                     print("Package built at: {}".format(build_folder))
@@ -134,4 +143,5 @@ class ConanCreateJob(object):
                                                      self.info.node_info)
                 self.info.repos.meta.store_success(self.info.build,
                                                    self.info.build_conf,
-                                                   self.info.node_info)
+                                                   self.info.node_info,
+                                                   time.time() - started)
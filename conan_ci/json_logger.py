@@ -2,11 +2,11 @@ import os
 import tempfile
 
 import fasteners
-import requests
 
 from conan_ci.model.build import Build
 from conan_ci.model.build_configuration import BuildConfiguration
 from conan_ci.model.node_info import NodeInfo
+from conan_ci.sessions import get_session
 
 
 class JsonLogger(object):
@@ -19,7 +19,7 @@ class JsonLogger(object):
 
     @staticmethod
     def get_new_doc():
-        ret = requests.post("https://api.myjson.com/bins", json={"elements": []})
+        ret = get_session().post("https://api.myjson.com/bins", json={"elements": []})
         if not ret.ok:
             raise Exception("Cannot create json remote")
         return ret.json()["uri"]
@@ -27,12 +27,12 @@ class JsonLogger(object):
     def push_doc(self, doc):
         # I'm doing this because with processes it collides between the read and the write
         with fasteners.InterProcessLock(self.lock_path, logger=None):
-            ret = requests.get(self.url)
+            ret = get_session().get(self.url)
             if not ret.ok:
                 raise Exception("Cannot read json remote")
             data = ret.json()
             data["elements"].append(doc)
-            ret = requests.put(self.url, json=data)
+            ret = get_session().put(self.url, json=data)
             if not ret.ok:
                 raise Exception("Cannot update json remote")
 
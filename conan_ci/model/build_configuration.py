@@ -5,6 +5,12 @@ class BuildConfiguration(object):
         self.project_ref = project_ref
         self.profile_name = profile_name
 
+    def __eq__(self, other):
+        return (self.project_ref, self.profile_name) == (other.project_ref, other.profile_name)
+
+    def __hash__(self):
+        return hash((self.project_ref, self.profile_name))
+
     def dumps(self):
         return {"project_ref": self.project_ref,
                 "profile_name": self.profile_name}
@@ -14,21 +14,26 @@ class BuildCreateInfo(object):
     repos: ReposBuild
     logger: JsonLogger
 
-    def __init__(self, build, build_conf, node_info, repos, logger):
+    def __init__(self, build, build_conf, node_info, repos, logger, notify_url=None):
         self.build = build
         self.build_conf = build_conf
         self.node_info = node_info
         self.repos = repos
         self.logger = logger
+        self.notify_url = notify_url  # To notify the coordinator the end of the job
 
         self.running_id = None  # This is for storing the ID of the process or any other ID
+        self.priority = 0  # Higher first when waiting for a free worker
+        self.worker = None  # The worker class that runs the job, "linux", "windows"...
+        self.started = None  # When it was sent to the CI, None for the attached ones
 
     def dumps(self):
         ret = {"build": self.build.dumps(),
                "build_conf": self.build_conf.dumps(),
                "node_info": self.node_info.dumps(),
                "repos": self.repos.dumps(),
-               "logger_url": self.logger.url}
+               "logger_url": self.logger.url,
+               "notify_url": self.notify_url}
         return ret
 
     @staticmethod
@@ -37,5 +42,6 @@ class BuildCreateInfo(object):
                               BuildConfiguration.loads(data["build_conf"]),
                               NodeInfo.loads(data["node_info"]),
                               ReposBuild.loads(art, data["repos"]),
-                              JsonLogger(data["logger_url"]))
+                              JsonLogger(data["logger_url"]),
+                              data.get("notify_url"))
         return ret
@@ -0,0 +1,81 @@
+from typing import Dict, List
+
+from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.node_info import NodeInfo
+
+
+class RunningNode(object):
+
+    def __init__(self, build_conf: BuildConfiguration, node_info: NodeInfo, running_id=None):
+        self.build_conf = build_conf
+        self.node_info = node_info
+        self.running_id = running_id  # The CI request id, to attach to it again
+
+    def dumps(self):
+        return {"build_conf": self.build_conf.dumps(),
+                "node_info": self.node_info.dumps(),
+                "running_id": self.running_id}
+
+    @staticmethod
+    def loads(data):
+        return RunningNode(BuildConfiguration.loads(data["build_conf"]),
+                           NodeInfo.loads(data["node_info"]),
+                           data.get("running_id"))
+
+
+class NodeChainCheckpoint(object):
+    """Compact state of the NodeChain scheduling, the project locks are stored apart. The
+    nodes to build of every configuration are the ones computed from the first locks, the
+    ended ones are the built ("modified") in the locks plus the skipped ones, with a binary
+    found in the repos"""
+
+    projects_refs: List[str]
+    profiles_names: List[str]
+    published: List[str]
+    failed: Dict[BuildConfiguration, List[str]]
+    running: List[RunningNode]
+    to_build: Dict[BuildConfiguration, List[str]]
+    skipped: Dict[BuildConfiguration, List[str]]
+
+    def __init__(self, projects_refs, profiles_names, published=None, failed=None,
+                 running=None, to_build=None, skipped=None):
+        self.projects_refs = projects_refs
+        self.profiles_names = profiles_names
+        self.published = published or []
+        self.failed = failed or {}
+        self.running = running or []
+        self.to_build = to_build or {}
+        self.skipped = skipped or {}
+
+    @property
+    def build_confs(self):
+        return [BuildConfiguration(project_ref, profile_name)
+                for project_ref in self.projects_refs for profile_name in self.profiles_names]
+
+    def dumps(self):
+        confs = []
+        for build_conf in self.build_confs:
+            confs.append({"build_conf": build_conf.dumps(),
+                          "to_build": self.to_build.get(build_conf, []),
+                          "skipped": self.skipped.get(build_conf, []),
+                          "failed": self.failed.get(build_conf, [])})
+        return {"projects_refs": self.projects_refs,
+                "profiles_names": self.profiles_names,
+                "published": self.published,
+                "configurations": confs,
+                "running": [r.dumps() for r in self.running]}
+
+    @staticmethod
+    def loads(data):
+        failed = {}
+        to_build = {}
+        skipped = {}
+        for conf in data["configurations"]:
+            build_conf = BuildConfiguration.loads(conf["build_conf"])
+            failed[build_conf] = conf["failed"]
+            to_build[build_conf] = conf["to_build"]
+            skipped[build_conf] = conf["skipped"]
+        return NodeChainCheckpoint(data["projects_refs"], data["profiles_names"],
+                                   data["published"], failed,
+                                   [RunningNode.loads(r) for r in data["running"]],
+                                   to_build, skipped)
@@ -0,0 +1,70 @@
+import json
+import os
+
+from conan_ci.tools import load
+
+
+class Lockfile(object):
+    """In memory Conan lockfile (conan.lock), enough to merge the nodes built by the jobs
+    without calling 'conan graph update-lock'"""
+
+    filename = "conan.lock"
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def nodes(self):
+        return self.data["graph_lock"]["nodes"]
+
+    def refs(self):
+        """The references of the graph, without revisions"""
+        return {node["pref"].split("#")[0] for node in self.nodes.values() if node.get("pref")}
+
+    def update_exported_ref(self, ref, rrev):
+        """Points the nodes of 'ref' (without revision) to the exported recipe revision,
+        without package revision they have to be built again"""
+        for node in self.nodes.values():
+            pref = node.get("pref")
+            if not pref:
+                continue
+            tmp = pref.split(":", 1)
+            node_ref, _, node_rrev = tmp[0].partition("#")
+            if node_ref != ref or node_rrev == rrev:
+                continue
+            new_pref = "{}#{}".format(ref, rrev)
+            if len(tmp) == 2:
+                new_pref = "{}:{}".format(new_pref, tmp[1].split("#")[0])
+            node["pref"] = new_pref
+
+    def update(self, other: "Lockfile"):
+        """Copies the pref and modified fields of the nodes built in 'other'"""
+        for node_id, node in other.nodes.items():
+            if not node.get("modified"):
+                continue
+            current = self.nodes.get(node_id)
+            if current is None:
+                raise Exception("Node '{}' ({}) not found in the lockfile".format(node_id,
+                                                                                node["pref"]))
+            if current.get("modified") and current["pref"] != node["pref"]:
+                raise Exception("Mismatch between lockfiles for node '{}': "
+                                "{} != {}".format(node_id, current["pref"], node["pref"]))
+            current["pref"] = node["pref"]
+            current["modified"] = node["modified"]
+
+    def dumps(self):
+        return json.dumps(self.data, indent=True)
+
+    def save(self, folder):
+        with open(os.path.join(folder, self.filename), "w") as f:
+            f.write(self.dumps())
+
+    @staticmethod
+    def loads(contents):
+        if isinstance(contents, bytes):
+            contents = contents.decode()
+        return Lockfile(json.loads(contents))
+
+    @staticmethod
+    def load(folder):
+        return Lockfile.loads(load(os.path.join(folder, Lockfile.filename)))
@@ -0,0 +1,22 @@
+class NodeStatus(object):
+    """What a create job has stored in the meta repo for its node"""
+
+    def __init__(self, ok=False, failed=False, log=False, lock=False, build_seconds=None):
+        self.ok = ok
+        self.failed = failed
+        self.log = log  # install.log present
+        self.lock = lock  # node conan.lock present
+        self.build_seconds = build_seconds  # Measured by the job, build and upload
+
+    def update(self, other):
+        """Adds the files found later for the same node"""
+        self.ok = self.ok or other.ok
+        self.failed = self.failed or other.failed
+        self.log = self.log or other.log
+        self.lock = self.lock or other.lock
+        if other.build_seconds is not None:
+            self.build_seconds = other.build_seconds
+
+    @property
+    def finished(self):
+        return self.ok or self.failed
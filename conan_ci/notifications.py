@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conan_ci.sessions import get_session
+
+
+class AdaptivePoller(object):
+    """Waits between the checks of ended jobs.
+
+    The wait finishes as soon as a job notifies its end, otherwise it grows exponentially
+    from min_delay to max_delay while the checks do not find ended jobs, so a long wave
+    does not consume the API calls limit and the next check after a notification is
+    immediate.
+    """
+
+    def __init__(self, min_delay: float, max_delay: float, factor: float = 2):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.factor = factor
+        self.delay = min_delay
+        self._event = threading.Event()
+
+    @staticmethod
+    def from_env():
+        min_delay = float(os.getenv("CONAN_CI_CHECK_MIN_DELAY_SECONDS", "0.5"))
+        max_delay = float(os.getenv("CONAN_CI_CHECK_DELAY_SECONDS", "30"))
+        return AdaptivePoller(min(min_delay, max_delay), max_delay)
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, found_ended):
+        """found_ended: if the last check found ended jobs. Returns True if notified"""
+        if found_ended:
+            self.delay = self.min_delay
+        notified = self._event.wait(self.delay)
+        self._event.clear()
+        if notified:
+            self.delay = self.min_delay
+        else:
+            self.delay = min(self.delay * self.factor, self.max_delay)
+        return notified
+
+
+class CompletionWebhook(object):
+    """Local HTTP server, any POST (from a worker job or the CI system) wakes the poller"""
+
+    def __init__(self, poller: AdaptivePoller, port: int, public_url=None):
+        self.poller = poller
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                print("Job end notification received: {}".format(body[:200]))
+                poller.notify()
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("", port), Handler)
+        self._thread = None
+        self.port = self._server.server_address[1]
+        self.url = public_url or "http://{}:{}/".format(socket.gethostname(), self.port)
+
+    @staticmethod
+    def from_env(poller: AdaptivePoller):
+        """Only enabled when CONAN_CI_WEBHOOK_PORT is defined"""
+        port = os.getenv("CONAN_CI_WEBHOOK_PORT")
+        if port is None:
+            return None
+        return CompletionWebhook(poller, int(port), os.getenv("CONAN_CI_WEBHOOK_URL"))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print("Listening job end notifications at: {}".format(self.url))
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def notify_job_ended(url, data):
+    """Best effort, the coordinator keeps polling the CI anyway"""
+    if not url:
+        return
+    try:
+        get_session().post(url, data=json.dumps(data), timeout=10,
+                           headers={"content-type": "application/json"})
+    except Exception as exc:
+        print("WARN: Cannot notify the end of the job to {}: {}".format(url, exc))
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from typing import Dict, List, Set
+
+
+def get_node_requires(node):
+    """Ids of the nodes a lockfile node depends on (regular and build requires)"""
+    ret = []
+    for key in ("requires", "build_requires"):
+        reqs = node.get(key) or []
+        if isinstance(reqs, dict):
+            reqs = reqs.values()
+        ret.extend(reqs)
+    return ret
+
+
+def pref_has_prev(pref):
+    tmp = pref.split(":", 1)
+    return len(tmp) == 2 and "#" in tmp[1]
+
+
+class BuildScheduler(object):
+    """Dependency driven scheduling of the nodes of a project lockfile.
+
+    The graph is parsed once: a node has to be built when its binary is not resolved
+    (no package revision) or when any of its dependencies has to be built, that is the
+    cascade of the package_revision_mode. Every node to build tracks how many of its
+    dependencies are still pending and it is released as soon as the last one ends.
+    The nodes already built ("modified": "Build") count as ended.
+
+    A resumed build passes the nodes to build computed by the first run ('to_build') and
+    the ended ones that are not marked as built in the lockfile ('ended', the skipped
+    ones), the package revisions in the lock do not tell them anymore.
+    """
+
+    _prefs: Dict[str, str]
+    _pending: Dict[str, int]
+    _dependents: Dict[str, Set[str]]
+
+    def __init__(self, lock_data, durations=None, to_build=None, ended=None):
+        nodes = lock_data["graph_lock"]["nodes"]
+        requires = {node_id: [str(r) for r in get_node_requires(node)]
+                    for node_id, node in nodes.items()}
+        resumed = set(to_build) if to_build is not None else None
+
+        to_build = {}  # Ordered, dependencies first
+        built = set()  # Already built in this build, the lockfile of a resumed build
+        for node_id in self._dependencies_first(requires):
+            node = nodes[node_id]
+            pref = node.get("pref")
+            if not pref:
+                continue
+            if resumed is not None:
+                if node_id in resumed:
+                    to_build[node_id] = pref
+                    if node.get("modified") == "Build":
+                        built.add(node_id)
+            elif node.get("modified") == "Build":
+                built.add(node_id)
+                to_build[node_id] = pref
+            elif any(r in to_build for r in requires[node_id]):
+                to_build[node_id] = pref
+            elif not pref_has_prev(pref):
+                to_build[node_id] = pref
+        built.update(node_id for node_id in ended or [] if node_id in to_build)
+
+        self._prefs = to_build
+        self._dependents = defaultdict(set)
+        self._pending = {}
+        self._final_package_id = set()
+        for node_id in to_build:
+            deps = [r for r in requires[node_id] if r in to_build]
+            if not deps:
+                self._final_package_id.add(node_id)
+            self._pending[node_id] = len([r for r in deps if r not in built])
+            for dep in deps:
+                self._dependents[dep].add(node_id)
+
+        self._ready = [node_id for node_id, count in self._pending.items()
+                       if count == 0 and node_id not in built]
+        self._ended = built
+        self._priorities = self._compute_priorities(durations or {})
+
+    def _compute_priorities(self, durations: Dict[str, float]):
+        """Estimated seconds of the longest path from every node to the end of the build,
+        'durations' are the historical build durations by reference (without revision)"""
+        default = sum(durations.values()) / len(durations) if durations else 1
+        ret = {}
+        for node_id in reversed(list(self._prefs)):  # Dependents first
+            duration = durations.get(self._prefs[node_id].split("#")[0], default)
+            ret[node_id] = duration + max([ret[d] for d in self._dependents[node_id]] or [0])
+        return ret
+
+    def has_final_package_id(self, node_id):
+        """None of its dependencies is built, so the package id of the lockfile is the one
+        it will have, with the package_revision_mode the others change with the build"""
+        return node_id in self._final_package_id
+
+    def priority(self, node_id):
+        return self._priorities[node_id]
+
+    @staticmethod
+    def _dependencies_first(requires):
+        dependents = defaultdict(list)
+        pending = {}
+        for node_id, reqs in requires.items():
+            reqs = [r for r in reqs if r in requires]
+            pending[node_id] = len(reqs)
+            for r in reqs:
+                dependents[r].append(node_id)
+        ret = [node_id for node_id, count in pending.items() if count == 0]
+        for node_id in ret:  # The list grows while iterating it
+            for dependent in dependents[node_id]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ret.append(dependent)
+        return ret
+
+    def pop_ready(self) -> List[List[str]]:
+        """The [node_id, pref] of the nodes that can be launched now, only returned once.
+        The nodes of the critical path (higher priority) go first"""
+        ready = sorted(self._ready, key=lambda n: -self._priorities[n])
+        ret = [[node_id, self._prefs[node_id]] for node_id in ready]
+        self._ready = []
+        return ret
+
+    def node_ended(self, node_id):
+        if node_id not in self._pending or node_id in self._ended:
+            return
+        self._ended.add(node_id)
+        for dependent in self._dependents[node_id]:
+            self._pending[dependent] -= 1
+            if self._pending[dependent] == 0:
+                self._ready.append(dependent)
+
+    @property
+    def to_build(self):
+        return list(self._prefs)
+
+    @property
+    def ended(self):
+        return [node_id for node_id in self._prefs if node_id in self._ended]
+
+    def finished(self):
+        return len(self._ended) == len(self._pending)
@@ -0,0 +1,37 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from rtpy import Rtpy
+
+_session = None
+_lock = threading.Lock()
+
+
+def pool_size():
+    return int(os.getenv("CONAN_CI_HTTP_POOL_SIZE", "16"))
+
+
+def get_session() -> requests.Session:
+    """The HTTP session shared by all the clients of the process (Artifactory, the CI and
+    the logger). It keeps the connections alive, reusing the TLS handshakes, with a pool of
+    CONAN_CI_HTTP_POOL_SIZE connections per host, enough for the download threads"""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size(), pool_maxsize=pool_size())
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def share_session(af: Rtpy):
+    """rtpy creates a session per API category and deep copies the settings, so the shared
+    one is set directly in every category"""
+    session = get_session()
+    for category in (af.artifacts_and_storage, af.builds, af.repositories, af.searches,
+                     af.security, af.system_and_configuration):
+        category._user_settings["session"] = session
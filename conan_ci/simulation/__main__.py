@@ -0,0 +1,43 @@
+"""python -m conan_ci.simulation --shape layered --libraries 5000 --limit default=20"""
+import argparse
+import json
+
+from conan_ci.simulation.graphs import SHAPES, base_ref, lock_data
+from conan_ci.simulation.simulator import random_durations, simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the scheduling of a build")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="layered")
+    parser.add_argument("--libraries", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--profiles", nargs="+", default=["linux_gcc"])
+    parser.add_argument("--limit", action="append", default=[],
+                        help="Max running jobs of a worker class: <worker>=<jobs>")
+    parser.add_argument("--mean-duration", type=float, default=600)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--no-critical-path", action="store_true",
+                        help="The scheduler doesn't know the job durations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as json")
+    args = parser.parse_args()
+
+    requires = SHAPES[args.shape](args.libraries)
+    locks = {}
+    for index in range(args.projects):
+        project_ref = "project{}/1.0@conan/stable".format(index)
+        locks[project_ref] = lock_data(project_ref, requires)
+    limits = {}
+    for limit in args.limit:
+        worker, jobs = limit.split("=")
+        limits[worker] = int(jobs)
+
+    report = simulate(locks, base_ref(requires), args.profiles,
+                      duration=random_durations(args.mean_duration, seed=args.seed),
+                      failure_rate=args.failure_rate, worker_limits=limits,
+                      critical_path=not args.no_critical_path, seed=args.seed)
+    print(json.dumps(report.dumps(), indent=True) if args.json else report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Synthetic Conan lockfiles, without any Conan or remote involved.
+
+The graphs are described as a list of requirements per library, the index 0 is the library
+at the top (the one the project requires directly) and every library only requires
+libraries with a greater index, so the last one is the base of the graph.
+"""
+import random
+from typing import List
+
+
+def library_ref(index):
+    return "lib{}/1.0@conan/stable".format(index)
+
+
+def _pref(ref, index):
+    return "{}#rrev{}:pkgid{}#prev{}".format(ref, index, index, index)
+
+
+def lock_data(project_ref, libraries_requires: List[List[int]]):
+    """The lockfile of 'conan graph lock <project_ref>': node '0' is the virtual root,
+    node '1' the project and the libraries go from the node '2' on"""
+    nodes = {"0": {"pref": None, "options": "", "requires": ["1"]},
+             "1": {"pref": _pref(project_ref, 0), "options": "",
+                   "requires": ["2"] if libraries_requires else []}}
+    for index, requires in enumerate(libraries_requires):
+        nodes[str(index + 2)] = {"pref": _pref(library_ref(index), index),
+                                 "options": "",
+                                 "requires": [str(r + 2) for r in requires]}
+    return {"graph_lock": {"nodes": nodes}, "version": "0.2"}
+
+
+def deep(libraries):
+    """A chain, every library requires the next one"""
+    return [[index + 1] for index in range(libraries - 1)] + [[]]
+
+
+def wide(libraries):
+    """The top library requires all the others and all of them require the base one"""
+    if libraries < 3:
+        return deep(libraries)
+    base = libraries - 1
+    return [list(range(1, base))] + [[base] for _ in range(1, base)] + [[]]
+
+
+def diamond(libraries):
+    """Diamonds stacked one over the other: 0 -> (1, 2) -> 3 -> (4, 5) -> 6..."""
+    ret = []
+    for index in range(libraries):
+        if index % 3 == 0:
+            ret.append([r for r in (index + 1, index + 2) if r < libraries])
+        elif index % 3 == 1:
+            ret.append([index + 2] if index + 2 < libraries else [])
+        else:
+            ret.append([index + 1] if index + 1 < libraries else [])
+    return ret
+
+
+def layered(libraries, width=10, max_requires=3, seed=0):
+    """Random graph of layers of up to 'width' libraries, every library requires up to
+    'max_requires' libraries of the next layer and every library is required at least
+    once. The top and the base layers have only one library"""
+    rnd = random.Random(seed)
+    if libraries < 3:
+        return deep(libraries)
+    base = libraries - 1
+    layers = [[0]] + [list(range(first, min(first + width, base)))
+                      for first in range(1, base, width)] + [[base]]
+    ret = [[] for _ in range(libraries)]
+    for layer, next_layer in zip(layers, layers[1:]):
+        required = set()
+        for index in layer:
+            count = rnd.randint(1, min(max_requires, len(next_layer)))
+            ret[index] = rnd.sample(next_layer, count)
+            required.update(ret[index])
+        for index in next_layer:
+            if index not in required:
+                ret[rnd.choice(layer)].append(index)
+    return [sorted(requires) for requires in ret]
+
+
+SHAPES = {"deep": deep,
+          "wide": wide,
+          "diamond": diamond,
+          "layered": layered}
+
+
+def base_ref(libraries_requires: List[List[int]]):
+    """The library every other one depends on, the natural one to modify"""
+    return library_ref(len(libraries_requires) - 1)
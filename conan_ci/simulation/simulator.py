@@ -0,0 +1,358 @@
+"""Discrete-event simulation of the NodeChain scheduling.
+
+The real NodeChain (schedulers, dispatcher, lock merging and project publishing) runs
+against synthetic lockfiles, an in-memory meta repo and a CI caller driven by a virtual
+clock, so thousands of jobs are "built" in seconds without Artifactory, Conan or Travis.
+"""
+import contextlib
+import copy
+import heapq
+import itertools
+import json
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List
+
+from conan_ci.conan_home import ConanHome
+from conan_ci.jobs.coordinator_job import NodeChain
+from conan_ci.model.build import Build
+from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.build_create_info import BuildCreateInfo
+from conan_ci.model.checkpoint import NodeChainCheckpoint
+from conan_ci.model.lockfile import Lockfile
+from conan_ci.model.node_status import NodeStatus
+from conan_ci.model.repos_build import ReposBuild
+from conan_ci.scheduler import pref_has_prev
+
+
+class VirtualClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def random_durations(mean=600, deviation=0.5, seed=0):
+    """Build seconds of every reference and profile, uniform around 'mean' and stable
+    for the same reference, as a real build would be"""
+    rnd = random.Random(seed)
+    memo = {}
+
+    def duration(profile_name, ref):
+        key = (profile_name, ref)
+        if key not in memo:
+            memo[key] = mean * rnd.uniform(1 - deviation, 1 + deviation)
+        return memo[key]
+    return duration
+
+
+class SimulatedCIAPICaller(object):
+    """Like the TravisAPICallerMock, but a job ends when the virtual clock reaches its
+    duration. The job outcome (status and node lock) is stored in the meta repo. The jobs
+    of the 'failing' references always fail"""
+
+    def __init__(self, clock: VirtualClock, meta: "SimulatedMetaRepo", duration,
+                 failure_rate=0.0, seed=0, failing=None):
+        self.clock = clock
+        self.meta = meta
+        self.duration = duration
+        self.failure_rate = failure_rate
+        self.failing = set(failing or [])
+        self._random = random.Random(seed)
+        self._running = []  # heap of (end_time, counter, create_info)
+        self._counter = itertools.count()
+        self.busy = defaultdict(float)  # Busy seconds by worker class
+        self.running_by_worker = defaultdict(int)
+        self.peak = defaultdict(int)  # Max concurrent jobs by worker class
+        self.jobs = 0
+
+    def call_build(self, create_info: BuildCreateInfo):
+        seconds = self.duration(create_info.build_conf.profile_name, create_info.node_info.ref)
+        create_info.running_id = next(self._counter)
+        heapq.heappush(self._running, (self.clock.now + seconds, create_info.running_id,
+                                       create_info))
+        self.jobs += 1
+        self.busy[create_info.worker] += seconds
+        self.running_by_worker[create_info.worker] += 1
+        self.peak[create_info.worker] = max(self.peak[create_info.worker],
+                                            self.running_by_worker[create_info.worker])
+
+    def attach(self, create_info: BuildCreateInfo):
+        """A resumed coordinator takes the job that kept running"""
+        for index, (end, running_id, _) in enumerate(self._running):
+            if running_id == create_info.running_id:
+                self._running[index] = (end, running_id, create_info)
+
+    def check_ended(self) -> List[BuildCreateInfo]:
+        ret = []
+        while self._running and self._running[0][0] <= self.clock.now:
+            _, _, create_info = heapq.heappop(self._running)
+            self.running_by_worker[create_info.worker] -= 1
+            ok = (create_info.node_info.ref not in self.failing and
+                  self._random.random() >= self.failure_rate)
+            self.meta.job_ended(create_info, ok)
+            ret.append(create_info)
+        return ret
+
+    def next_end(self):
+        return self._running[0][0] if self._running else self.clock.now
+
+    def empty_queue(self):
+        return not self._running
+
+
+class VirtualPoller(object):
+    """Instead of sleeping, moves the clock to the end of the next job"""
+
+    def __init__(self, clock: VirtualClock, caller: SimulatedCIAPICaller):
+        self.clock = clock
+        self.caller = caller
+
+    def notify(self):
+        pass
+
+    def wait(self, found_ended):
+        self.clock.now = max(self.clock.now, self.caller.next_end())
+        return True
+
+
+class SimulatedMetaRepo(object):
+    """The part of the MetaRepo used by the NodeChain, in memory"""
+
+    def __init__(self, projects_refs, profiles_names, worker_limits=None,
+                 profile_workers=None, build_durations=None, last_refs=None):
+        self.projects_refs = projects_refs
+        self.profiles_names = profiles_names
+        self.worker_limits = worker_limits or {}
+        self.profile_workers = profile_workers or {}
+        self.build_durations = build_durations or {}
+        self.last_refs = last_refs or {}  # Project ref => references of its last lock
+        self._locks = {}
+        self._status = {}
+        self._stored = []  # The nodes in the order their status was stored
+        self._checkpoint = None
+        self._prevs = itertools.count()
+
+    def get_projects_refs(self):
+        return self.projects_refs
+
+    def get_profile_names(self):
+        return self.profiles_names
+
+    def get_worker_limits(self):
+        return self.worker_limits
+
+    def get_profile_workers(self, profiles_names):
+        return {name: worker for name, worker in self.profile_workers.items()
+                if name in profiles_names}
+
+    def get_build_durations(self):
+        return self.build_durations
+
+    def get_last_project_refs(self, build_conf):
+        return self.last_refs.get(build_conf.project_ref)
+
+    def store_build_durations(self, durations):
+        self.build_durations = copy.deepcopy(durations)
+
+    def store_checkpoint(self, build, checkpoint: NodeChainCheckpoint):
+        self._checkpoint = json.dumps(checkpoint.dumps())
+
+    def get_checkpoint(self, build):
+        if self._checkpoint is None:
+            return None
+        return NodeChainCheckpoint.loads(json.loads(self._checkpoint))
+
+    def store_project_lockfile(self, lockfile: Lockfile, build, build_conf):
+        self._locks[build_conf] = lockfile  # Not copied, the NodeChain stores it every change
+
+    def get_project_lock(self, build, build_conf) -> Lockfile:
+        return Lockfile(copy.deepcopy(self._locks[build_conf].data))
+
+    def remove_build_files(self, build):
+        self._status.clear()
+        self._stored = []
+
+    def remove_node_files(self, build, build_conf, node_info):
+        self._status.pop((build_conf, node_info.id), None)
+
+    def job_ended(self, create_info: BuildCreateInfo, ok):
+        self._status[(create_info.build_conf, create_info.node_info.id)] = ok
+        self._stored.append((create_info.build_conf, create_info.node_info.id))
+
+    @staticmethod
+    def node_path(build, build_conf, node_info):
+        return build_conf, node_info.id
+
+    def get_nodes_status(self, build, since=None):
+        """The nodes with a status stored from 'since' on, an index of the stored ones"""
+        ret = {}
+        for key in self._stored[since or 0:]:
+            ok = self._status.get(key)
+            if ok is not None:  # Not removed
+                ret[key] = NodeStatus(ok=ok, failed=not ok, log=not ok, lock=ok)
+        return ret, len(self._stored)
+
+    def get_log(self, build, build_conf, node_info):
+        return "Simulated failure"
+
+    def get_node_lock(self, build, build_conf, node_info) -> Lockfile:
+        """Only the built node, it is all the NodeChain merges from a node lock. Every
+        build creates a different package revision"""
+        pref = self._locks[build_conf].nodes[node_info.id]["pref"]
+        if pref_has_prev(pref):  # Built because of a dependency
+            pref = pref.rsplit("#", 1)[0]
+        pref = "{}#simulated{}".format(pref, next(self._prevs))
+        return Lockfile({"graph_lock": {"nodes": {node_info.id: {"pref": pref,
+                                                                  "modified": "Build"}}}})
+
+
+class _SimulatedRepo(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.url = "simulated://{}".format(name)
+
+    @staticmethod
+    def get_artifactory():
+        return None
+
+
+class _SimulatedConanHome(ConanHome):
+
+    def setup(self, read_url, write_url):
+        pass
+
+
+class _NullLogger(object):
+
+    def add_graph(self, build, build_conf, graph):
+        pass
+
+    def add_node_building(self, node_info):
+        pass
+
+
+class SimulatedNodeChain(NodeChain):
+    """The NodeChain without Conan, Artifactory or build info: the locks are the
+    synthetic ones and publishing a project only records when it happened"""
+
+    def __init__(self, locks: Dict[str, dict], modified_ref, caller: SimulatedCIAPICaller,
+                 meta: SimulatedMetaRepo, clock: VirtualClock, existing_packages=None,
+                 resume=False):
+        repos = ReposBuild(_SimulatedRepo("read"), _SimulatedRepo("write"), meta)
+        super(SimulatedNodeChain, self).__init__(Build("simulation", "1"), repos, caller,
+                                                 _NullLogger(), resume)
+        self.locks = locks
+        self.modified_ref = modified_ref
+        self.existing_packages = existing_packages or {}  # Package path => prev
+        self.clock = clock
+        self.dispatcher.clock = clock
+        self.conan_home = _SimulatedConanHome(None)
+        self.poller = VirtualPoller(clock, caller)
+        self.webhook = None
+        self.rounds = 0
+        self.published_times = {}
+
+    def _export_modified_recipe(self):
+        return self.modified_ref, "simulated"
+
+    def _find_package_revisions(self, packages_paths):
+        return {path: (self.existing_packages[path], self.repos.read.name)
+                for path in packages_paths if path in self.existing_packages}
+
+    def _compute_locks(self, build_confs: List[BuildConfiguration]):
+        return {build_conf: Lockfile(copy.deepcopy(self.locks[build_conf.project_ref]))
+                for build_conf in build_confs}
+
+    def _process_build_info(self, builder, project_ref, profiles_names):
+        pass
+
+    def _publish_build_info(self, builder, project_ref, profiles_names):
+        self.published_times[project_ref] = self.clock()
+        self._published.append(project_ref)
+
+    def process_ended_nodes(self):
+        ended = super(SimulatedNodeChain, self).process_ended_nodes()
+        if ended:
+            self.rounds += 1
+        return ended
+
+
+class SimulationReport(object):
+
+    def __init__(self, makespan, jobs, rounds, utilization, peak, published, error=None):
+        self.makespan = makespan
+        self.jobs = jobs
+        self.rounds = rounds
+        self.utilization = utilization  # By worker class, busy / (capacity * makespan)
+        self.peak = peak  # Max concurrent jobs by worker class
+        self.published = published  # Project ref => seconds
+        self.error = error
+
+    def dumps(self):
+        return {"makespan": self.makespan,
+                "jobs": self.jobs,
+                "rounds": self.rounds,
+                "utilization": self.utilization,
+                "peak": self.peak,
+                "published": self.published,
+                "error": self.error}
+
+    def __str__(self):
+        lines = ["Makespan: {:.1f}s".format(self.makespan),
+                 "Jobs: {}".format(self.jobs),
+                 "Scheduling rounds: {}".format(self.rounds)]
+        for worker in sorted(self.utilization):
+            lines.append("Worker '{}': {:.1%} utilization, {} "
+                         "concurrent jobs max".format(worker, self.utilization[worker],
+                                                      self.peak[worker]))
+        if self.error:
+            lines.append("Failed: {}".format(self.error))
+        return "\n".join(lines)
+
+
+def simulate(locks: Dict[str, dict], modified_ref, profiles_names, duration=None,
+             failure_rate=0.0, worker_limits=None, profile_workers=None,
+             critical_path=True, existing_packages=None, seed=0,
+             verbose=False) -> SimulationReport:
+    """Runs a NodeChain for the 'locks' (project ref => lockfile data) of every profile,
+    modifying 'modified_ref'. 'duration(profile_name, ref)' gives the seconds of every job,
+    with 'critical_path' the scheduler knows them in advance as the historical durations.
+    'existing_packages' (package path => prev) are the binaries already in the repos"""
+    duration = duration or random_durations(seed=seed)
+    build_durations = {}
+    if critical_path:
+        for profile_name in profiles_names:
+            build_durations[profile_name] = {
+                node["pref"].split("#")[0]: duration(profile_name, node["pref"].split("#")[0])
+                for lock in locks.values() for node in lock["graph_lock"]["nodes"].values()
+                if node.get("pref")}
+
+    clock = VirtualClock()
+    last_refs = {project_ref: Lockfile(lock).refs() for project_ref, lock in locks.items()}
+    meta = SimulatedMetaRepo(list(locks), profiles_names, worker_limits, profile_workers,
+                             build_durations, last_refs)
+    caller = SimulatedCIAPICaller(clock, meta, duration, failure_rate, seed)
+    chain = SimulatedNodeChain(locks, modified_ref, caller, meta, clock, existing_packages)
+
+    error = None
+    with contextlib.ExitStack() as stack:
+        if not verbose:  # The NodeChain prints every lock and launch
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(
+                open(os.devnull, "w"))))
+        try:
+            chain.run()
+        except Exception as exc:
+            error = str(exc)
+
+    makespan = clock.now
+    utilization = {}
+    for worker, busy in caller.busy.items():
+        capacity = chain.dispatcher.limit(worker) or caller.peak[worker]
+        utilization[worker] = busy / (capacity * makespan) if makespan else 0.0
+    return SimulationReport(makespan, caller.jobs, chain.rounds, utilization,
+                            dict(caller.peak), chain.published_times, error)
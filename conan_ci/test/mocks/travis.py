@@ -2,8 +2,9 @@ import copy
 import json
 import multiprocessing
 import tempfile
-from typing import Dict, Callable
+from typing import Dict, Callable, Tuple
 
+from conan_ci.model.build_configuration import BuildConfiguration
 from conan_ci.model.build_create_info import BuildCreateInfo
 from conan_ci.test.mocks.git import GitRepo
 from conan_ci.tools import environment_append, chdir
@@ -11,7 +12,7 @@ from conan_ci.tools import environment_append, chdir
 
 class TravisAPICallerMock(object):
     """Not multiprocess, it will launch the job in the same process"""
-    _run_processes: Dict[str, BuildCreateInfo]
+    _run_processes: Dict[Tuple[BuildConfiguration, str], BuildCreateInfo]
 
     def __init__(self, travis):
         self.travis = travis
@@ -23,7 +24,7 @@ class TravisAPICallerMock(object):
 
         self.travis.fire_build("company/build_node", "master", "Launching Job", env)
 
-        self._run_processes[create_info.node_info.id] = create_info
+        self._run_processes[(create_info.build_conf, create_info.node_info.id)] = create_info
 
     def check_ended(self):
         node_infos = self._run_processes.values()
@@ -35,8 +36,8 @@ class TravisAPICallerMock(object):
 
 
 class TravisAPICallerMultiThreadMock(object):
-    _run_processes: Dict[str, BuildCreateInfo]
-    _end_processes: Dict[str, BuildCreateInfo]
+    _run_processes: Dict[Tuple[BuildConfiguration, str], BuildCreateInfo]
+    _end_processes: Dict[Tuple[BuildConfiguration, str], BuildCreateInfo]
 
     def __init__(self, travis):
         self.travis = travis
@@ -52,16 +53,16 @@ class TravisAPICallerMultiThreadMock(object):
         p.start()
         create_info.running_id = p
 
-        self._run_processes[create_info.node_info.id] = create_info
+        self._run_processes[(create_info.build_conf, create_info.node_info.id)] = create_info
 
     def check_ended(self):
         node_infos = []
-        for node_id, node_info in self._run_processes.items():
+        for key, node_info in self._run_processes.items():
             if not node_info.running_id.is_alive():
-                self._end_processes[node_id] = node_info
+                self._end_processes[key] = node_info
                 node_infos.append(node_info)
         for node_info in node_infos:
-            del self._run_processes[node_info.node_info.id]
+            del self._run_processes[(node_info.build_conf, node_info.node_info.id)]
         return node_infos
 
     def empty_queue(self):
@@ -0,0 +1,24 @@
+import unittest
+from unittest import mock
+
+from conan_ci import artifactory
+from conan_ci.artifactory import get_artifactory
+
+
+class TestArtifactoryRegistry(unittest.TestCase):
+
+    def test_reused_and_pinged_once_per_ttl(self):
+        url = "http://registry.test:8090/artifactory"
+        with mock.patch("rtpy.system_and_configuration.RtpySystemAndConfiguration."
+                        "system_health_ping") as ping:
+            art = get_artifactory(url, "admin", "password")
+            self.assertIs(art, get_artifactory(url, "admin", "password"))
+            self.assertIs(art, art.get_repo("meta").get_artifactory())
+            self.assertEqual(1, ping.call_count)
+
+            self.assertIsNot(art, get_artifactory(url, "other", "password"))
+            self.assertEqual(2, ping.call_count)
+
+            art._last_health_check -= artifactory.Artifactory.health_ttl + 1
+            get_artifactory(url, "admin", "password")
+            self.assertEqual(3, ping.call_count)
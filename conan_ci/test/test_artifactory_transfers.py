@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conan_ci.artifactory import Artifactory
+from conan_ci.disk_cache import DiskCache
+from conan_ci.model.build import Build
+
+
+class _FakeArtifactoryHandler(BaseHTTPRequestHandler):
+    """Stores the PUT files, answers GET with the sha1 headers and conditional requests"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_PUT(self):
+        self.server.puts.append(self.path)
+        sha1 = self.headers.get("X-Checksum-Sha1")
+        if self.headers.get("X-Checksum-Deploy") == "true":
+            stored = [c for c in self.server.files.values()
+                      if hashlib.sha1(c).hexdigest() == sha1]
+            if not stored:
+                self.send_response(404)
+                self.end_headers()
+                return
+            contents = stored[0]
+        else:
+            contents = self.rfile.read(int(self.headers["Content-Length"]))
+            self.server.uploads += 1
+        self.server.files[self.path] = contents
+        self.send_response(201)
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.gets.append(self.path)
+        if self.path in self.server.errors:
+            self.send_response(self.server.errors[self.path])
+            self.end_headers()
+            return
+        contents = self.server.files.get(self.path)
+        if contents is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        sha1 = hashlib.sha1(contents).hexdigest()
+        if self.headers.get("If-None-Match") == sha1:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", sha1)
+        self.send_header("X-Checksum-Sha1", self.server.bad_sha1 or sha1)
+        self.send_header("Content-Length", str(len(contents)))
+        self.end_headers()
+        self.wfile.write(contents)
+
+
+class TestArtifactoryTransfers(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeArtifactoryHandler)
+        self.server.files = {}
+        self.server.gets = []
+        self.server.puts = []
+        self.server.uploads = 0
+        self.server.bad_sha1 = None
+        self.server.errors = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        art = Artifactory("http://127.0.0.1:{}/artifactory".format(self.server.server_port),
+                          "admin", "password")
+        self.repo = art.get_repo("repo")
+        self.meta = art.get_repo("meta").as_meta()
+        self.meta.cache = DiskCache(tempfile.mkdtemp(), 1024 * 1024)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stream_download_and_upload(self):
+        self.repo.chunk_size = 10
+        self.repo.deploy_contents("lockfiles/conan.lock", "x" * 1000)
+        source = os.path.join(self.folder, "source.txt")
+        with open(source, "wb") as f:
+            f.write(b"file contents")
+        self.repo.deploy(source, "profiles/linux")
+        self.assertEqual(b"x" * 1000, self.server.files["/artifactory/repo/lockfiles/conan.lock"])
+
+        path = self.repo.download_file("lockfiles/conan.lock", self.folder)
+        with open(path, "rb") as f:
+            self.assertEqual(b"x" * 1000, f.read())
+        self.assertEqual(b"file contents", self.repo.read_file("profiles/linux"))
+
+        self.server.bad_sha1 = "0" * 40
+        os.remove(path)
+        with self.assertRaisesRegex(Exception, "Checksum mismatch"):
+            self.repo.download_file("lockfiles/conan.lock", self.folder)
+        self.assertEqual(["source.txt"], os.listdir(self.folder))  # No partial file
+
+    def test_meta_cache(self):
+        self.server.files["/artifactory/meta/config.json"] = b'{"projects": []}'
+        self.assertEqual(b'{"projects": []}', self.meta.read_file("config.json"))
+        self.assertEqual(b'{"projects": []}', self.meta.read_file("config.json"))
+        self.assertEqual(2, len(self.server.gets))  # Validated, 304 the second time
+
+        self.server.files["/artifactory/meta/config.json"] = b'{"projects": ["P1"]}'
+        self.assertEqual(b'{"projects": ["P1"]}', self.meta.read_file("config.json"))
+
+        self.meta.deploy_contents("node/conan.lock", "{}")
+        self.assertEqual(b"{}", self.meta.read_file("node/conan.lock"))
+        self.server.files["/artifactory/meta/node/conan.lock"] = b'{"graph_lock": {}}'  # Reused
+        path = self.meta.download_file("node/conan.lock", self.folder)
+        with open(path) as f:
+            self.assertEqual('{"graph_lock": {}}', f.read())
+        self.assertEqual(5, len(self.server.gets))
+
+    def test_checksum_deploy(self):
+        self.repo.deploy_contents("locks/1/conan.lock", "lock contents")
+        self.repo.deploy_contents("locks/latest_conan.lock", "lock contents")
+        self.assertEqual(1, self.server.uploads)  # The second one only the checksum
+        self.assertEqual(b"lock contents",
+                         self.server.files["/artifactory/repo/locks/latest_conan.lock"])
+
+        self.repo.deploy_contents("locks/latest_conan.lock", "lock contents")
+        self.assertEqual(3, len(self.server.puts))  # Unchanged, nothing sent
+
+        source = os.path.join(self.folder, "conan.lock")
+        with open(source, "wb") as f:
+            f.write(b"new lock contents")
+        self.repo.deploy(source, "locks/latest_conan.lock")
+        self.assertEqual(2, self.server.uploads)
+        self.assertEqual(b"new lock contents",
+                         self.server.files["/artifactory/repo/locks/latest_conan.lock"])
+
+    def test_only_not_found_is_missing(self):
+        build = Build("mybuild", "1")
+        self.assertIsNone(self.meta.get_checkpoint(build))
+        self.assertEqual({}, self.meta.get_build_durations())
+
+        # An error doesn't mean there is no checkpoint, the build state would be removed
+        self.server.errors["/artifactory/meta/build_durations.json"] = 500
+        with self.assertRaisesRegex(Exception, "Error reading build_durations.json"):
+            self.meta.get_build_durations()
+        self.server.errors = {"/artifactory/meta/" + self.meta._checkpoint_path(build): 401}
+        with self.assertRaisesRegex(Exception, "Error reading"):
+            self.meta.get_checkpoint(build)
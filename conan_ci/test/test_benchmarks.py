@@ -0,0 +1,15 @@
+import unittest
+
+from conan_ci.benchmarks import BENCHMARKS, compare, run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        results = run_benchmarks(["deep", "diamond"], [20], repeat=1)
+        self.assertEqual(2 * len(BENCHMARKS), len(results["results"]))
+        self.assertEqual([], compare(results, results, 0.2))
+
+        slower = {"results": [dict(r, best=r["best"] * 2 + 1) for r in results["results"]]}
+        regressions = compare(results, slower, 0.2)
+        self.assertEqual(len(results["results"]), len(regressions))
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from conan_ci.artifactory import Artifactory
+from conan_ci.build_info import BuildInfoBuilder, get_remote_path_from_pref, \
+    get_remote_path_from_ref
+from conan_ci.disk_cache import DiskCache
+from conan_ci.model.build import Build
+from conan_ci.simulation.graphs import deep, lock_data
+
+
+def _aql_results(q):
+    """Two files in every queried path"""
+    paths = [c["path"] for c in json.loads(q[len("items.find("):q.index(").include")])["$or"]]
+    ret = []
+    for path in paths:
+        ret.append({"repo": "repo", "path": path, "name": "conanmanifest.txt",
+                    "actual_sha1": "sha1_" + path, "actual_md5": "md5_" + path})
+        ret.append({"repo": "repo", "path": path, "name": ".timestamp",
+                    "actual_sha1": "sha1_ts", "actual_md5": "md5_ts"})
+    return {"results": ret}
+
+
+class TestBuildInfoBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.art = Artifactory("http://localhost:8090/artifactory", "admin", "password")
+        self.art.aql_paths_chunk = 4
+        data = lock_data("project/1.0@conan/stable", deep(5))
+        for node in data["graph_lock"]["nodes"].values():
+            if node["pref"]:
+                node["modified"] = "Build"
+        self.lockfile_path = os.path.join(tempfile.mkdtemp(), "conan.lock")
+        with open(self.lockfile_path, "w") as f:
+            f.write(json.dumps(data))
+        self.prefs = [n["pref"] for n in data["graph_lock"]["nodes"].values() if n["pref"]]
+
+    def test_batched_queries(self):
+        builder = BuildInfoBuilder(self.art)
+        with mock.patch.object(self.art.af.searches, "artifactory_query_language",
+                               side_effect=_aql_results) as aql:
+            builder.process_lockfile(self.lockfile_path)
+        self.assertEqual(3, aql.call_count)  # 12 paths (6 packages and recipes), 4 per query
+
+        bi = builder.get_build_info(Build("mybuild", "1"))
+        self.assertEqual(6, len(bi["modules"]))
+        module = [m for m in bi["modules"] if m["id"] == "lib0/1.0@conan/stable"][0]
+        pref = self.prefs[1]
+        self.assertEqual(["sha1_" + get_remote_path_from_pref(pref),
+                          "sha1_{}/export".format(get_remote_path_from_ref(pref))],
+                         [a["sha1"] for a in module["artifacts"]])
+
+    def test_memoized_files(self):
+        meta = self.art.get_repo("meta").as_meta()
+        meta.cache = DiskCache(tempfile.mkdtemp(), 1024 * 1024)
+        builder = BuildInfoBuilder(self.art, meta)
+        with mock.patch.object(self.art.af.searches, "artifactory_query_language",
+                               side_effect=_aql_results) as aql:
+            builder.process_lockfile(self.lockfile_path)
+            builder.process_lockfile(self.lockfile_path)  # Other profile, same paths
+            self.assertEqual(3, aql.call_count)
+
+            other_builder = BuildInfoBuilder(self.art, meta)  # Next build
+            other_builder.process_lockfile(self.lockfile_path)
+            self.assertEqual(3, aql.call_count)
+        self.assertEqual(builder.get_build_info(Build("mybuild", "1"))["modules"],
+                         other_builder.get_build_info(Build("mybuild", "2"))["modules"])
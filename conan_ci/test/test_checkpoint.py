@@ -0,0 +1,27 @@
+import json
+import unittest
+
+from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.checkpoint import NodeChainCheckpoint, RunningNode
+from conan_ci.model.node_info import NodeInfo
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_dumps_loads(self):
+        linux = BuildConfiguration("P1/1.0@conan/stable", "linux_gcc")
+        windows = BuildConfiguration("P1/1.0@conan/stable", "windows_msvc")
+        running = RunningNode(windows, NodeInfo("2", "AA/1.0@conan/stable"), 1234)
+        checkpoint = NodeChainCheckpoint(["P1/1.0@conan/stable"], ["linux_gcc", "windows_msvc"],
+                                         published=[], failed={linux: ["3"]}, running=[running],
+                                         to_build={linux: ["1", "2", "3"], windows: ["2"]},
+                                         skipped={linux: ["1"]})
+        loaded = NodeChainCheckpoint.loads(json.loads(json.dumps(checkpoint.dumps())))
+        self.assertEqual([linux, windows], loaded.build_confs)
+        self.assertEqual({linux: ["3"], windows: []}, loaded.failed)
+        self.assertEqual({linux: ["1", "2", "3"], windows: ["2"]}, loaded.to_build)
+        self.assertEqual({linux: ["1"], windows: []}, loaded.skipped)
+        self.assertEqual(1, len(loaded.running))
+        self.assertEqual(windows, loaded.running[0].build_conf)
+        self.assertEqual("AA/1.0@conan/stable", loaded.running[0].node_info.ref)
+        self.assertEqual(1234, loaded.running[0].running_id)
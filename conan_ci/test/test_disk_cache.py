@@ -0,0 +1,39 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from conan_ci.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = DiskCache(os.path.join(tempfile.mkdtemp(), "cache"), 1024)
+        self.assertIsNone(cache.get("meta/config.json"))
+        cache.put("meta/config.json", b"{}")
+        self.assertEqual(b"{}", cache.get("meta/config.json"))
+
+    def test_lru_eviction(self):
+        cache = DiskCache(tempfile.mkdtemp(), 250)
+        cache.put("a", b"a" * 100)
+        cache.put("b", b"b" * 100)
+        past = time.time() - 100
+        os.utime(cache._path("a"), (past, past))
+        os.utime(cache._path("b"), (past + 1, past + 1))
+        self.assertIsNotNone(cache.get("a"))  # Now "b" is the least recently used
+        cache.put("c", b"c" * 100)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_folder_listed_when_exceeded(self):
+        cache = DiskCache(tempfile.mkdtemp(), 1000)
+        with mock.patch("conan_ci.disk_cache.os.listdir", wraps=os.listdir) as listdir:
+            for index in range(10):
+                cache.put(str(index), b"x" * 100)
+            self.assertEqual(1, listdir.call_count)  # The initial size
+            cache.put("10", b"x" * 100)
+            self.assertEqual(2, listdir.call_count)
+        self.assertLessEqual(cache._size, 800)
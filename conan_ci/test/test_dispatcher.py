@@ -0,0 +1,62 @@
+import unittest
+
+from conan_ci.dispatcher import Dispatcher
+from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.build_create_info import BuildCreateInfo
+from conan_ci.model.node_info import NodeInfo
+
+
+class _FakeCaller(object):
+
+    def __init__(self):
+        self.running = []
+        self.ended = []
+
+    def call_build(self, create_info):
+        self.running.append(create_info)
+
+    def check_ended(self):
+        ret, self.ended = self.ended, []
+        return ret
+
+    def empty_queue(self):
+        return not self.running
+
+
+def _create_info(profile_name, name, priority=0):
+    info = BuildCreateInfo(None, BuildConfiguration("P1/1.0@conan/stable", profile_name),
+                           NodeInfo(name, "{}/1.0@conan/stable".format(name)),
+                           None, None)
+    info.priority = priority
+    return info
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def test_limit_by_worker(self):
+        caller = _FakeCaller()
+        now = [0]
+        dispatcher = Dispatcher(caller, limits={"linux": 1},
+                                profile_workers={"gcc": "linux"}, clock=lambda: now[0])
+        dispatcher.call_build(_create_info("gcc", "AA", priority=1))
+        dispatcher.call_build(_create_info("gcc", "BB", priority=5))
+        dispatcher.call_build(_create_info("gcc", "CC", priority=10))
+        dispatcher.call_build(_create_info("windows_msvc", "DD"))
+        self.assertEqual(["AA", "DD"], [i.node_info.id for i in caller.running])
+        self.assertEqual(2, dispatcher.queued())
+
+        # The highest priority goes first when a linux worker is free
+        now[0] = 100
+        caller.ended.append(caller.running.pop(0))
+        dispatcher.check_ended()
+        self.assertEqual(["DD", "CC"], [i.node_info.id for i in caller.running])
+        self.assertEqual([0, 100], [i.started for i in caller.running])  # Not queued time
+        self.assertFalse(dispatcher.empty_queue())
+
+    def test_default_limit(self):
+        caller = _FakeCaller()
+        dispatcher = Dispatcher(caller, limits={"default": 1})
+        dispatcher.call_build(_create_info("clang", "AA"))
+        dispatcher.call_build(_create_info("clang", "BB"))
+        self.assertEqual("default", caller.running[0].worker)
+        self.assertEqual(1, dispatcher.queued())
@@ -0,0 +1,51 @@
+import unittest
+
+from conan_ci.model.lockfile import Lockfile
+
+
+def _lock(nodes):
+    return Lockfile({"graph_lock": {"nodes": nodes}, "version": "0.2"})
+
+
+class TestLockfile(unittest.TestCase):
+
+    def test_update_copies_built_nodes(self):
+        project = _lock({"0": {"pref": "P1/1.0@conan/stable#r1:p1#v1", "requires": ["1"]},
+                         "1": {"pref": "AA/1.0@conan/stable#r2:p2", "requires": []}})
+        node = _lock({"0": {"pref": "P1/1.0@conan/stable#r1:p1#v1", "requires": ["1"]},
+                      "1": {"pref": "AA/1.0@conan/stable#r2:p3#v3", "requires": [],
+                            "modified": "Build"}})
+        project.update(node)
+        self.assertEqual({"pref": "AA/1.0@conan/stable#r2:p3#v3", "requires": [],
+                          "modified": "Build"}, project.nodes["1"])
+        self.assertNotIn("modified", project.nodes["0"])
+
+        # Merging the same node again is harmless, a different binary is not
+        project.update(node)
+        node.nodes["1"]["pref"] = "AA/1.0@conan/stable#r2:p3#v4"
+        with self.assertRaisesRegex(Exception, "Mismatch between lockfiles"):
+            project.update(node)
+
+    def test_dumps_loads(self):
+        lock = _lock({"0": {"pref": "P1/1.0@conan/stable#r1:p1#v1"}})
+        self.assertEqual(lock.data, Lockfile.loads(lock.dumps().encode()).data)
+
+    def test_update_exported_ref(self):
+        lock = _lock({"0": {"pref": "P1/1.0@conan/stable#r1:p1#v1", "requires": ["1"]},
+                      "1": {"pref": "AA/1.0@conan/stable#r1:p2#v2", "requires": []},
+                      "2": {"pref": "AA/2.0@conan/stable#r1:p2#v2", "requires": []}})
+        lock.update_exported_ref("AA/1.0@conan/stable", "r3")
+        self.assertEqual("AA/1.0@conan/stable#r3:p2", lock.nodes["1"]["pref"])
+        self.assertEqual("AA/2.0@conan/stable#r1:p2#v2", lock.nodes["2"]["pref"])
+        self.assertEqual("P1/1.0@conan/stable#r1:p1#v1", lock.nodes["0"]["pref"])
+
+        # Already resolved with the exported revision
+        lock.nodes["1"]["pref"] = "AA/1.0@conan/stable#r3:p2#v4"
+        lock.update_exported_ref("AA/1.0@conan/stable", "r3")
+        self.assertEqual("AA/1.0@conan/stable#r3:p2#v4", lock.nodes["1"]["pref"])
+
+    def test_refs(self):
+        lock = _lock({"0": {"pref": None, "requires": ["1"]},
+                      "1": {"pref": "P1/1.0@conan/stable#r1:p1#v1", "requires": ["2"]},
+                      "2": {"pref": "AA/1.0@conan/stable#r2"}})
+        self.assertEqual({"P1/1.0@conan/stable", "AA/1.0@conan/stable"}, lock.refs())
@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+
+from rtpy.tools import RtpyBase
+
+from conan_ci.artifactory import Artifactory
+from conan_ci.model.build import Build
+from conan_ci.model.build_configuration import BuildConfiguration
+from conan_ci.model.node_info import NodeInfo
+
+
+class TestMetaRepo(unittest.TestCase):
+
+    def setUp(self):
+        self.art = Artifactory("http://localhost:8090/artifactory", "admin", "password")
+        self.meta = self.art.get_repo("meta").as_meta()
+
+    def test_nodes_status_since_last_query(self):
+        build = Build("mybuild", "3")
+        build_conf = BuildConfiguration("P1/1.0@conan/stable", "linux_gcc")
+        aa = self.meta.node_path(build, build_conf, NodeInfo("1", "AA/1.0@conan/stable"))
+        bb = self.meta.node_path(build, build_conf, NodeInfo("2", "BB/1.0@conan/stable"))
+        self.assertEqual("lockfiles/mybuild/3/P1_1.0_conan_stable/linux_gcc/AA_1.0_conan_stable_1",
+                         aa)
+        results = [{"path": aa, "name": "conan.lock", "created": "2020-04-20T10:00:00.000Z"},
+                   {"path": aa, "name": "OK", "created": "2020-04-20T10:00:01.000Z",
+                    "properties": [{"key": "build_seconds", "value": "42.5"}]},
+                   {"path": bb, "name": "install.log", "created": "2020-04-20T10:02:00.000Z"}]
+        with mock.patch.object(self.meta.af.searches, "artifactory_query_language",
+                               return_value={"results": results}) as aql:
+            status, since = self.meta.get_nodes_status(build)
+        self.assertEqual(1, aql.call_count)
+        self.assertIn('"lockfiles/mybuild/3/*"', aql.call_args[0][0])
+        self.assertNotIn('"created"', aql.call_args[0][0].split(".include")[0])
+        self.assertTrue(status[aa].ok and status[aa].lock)
+        self.assertEqual(42.5, status[aa].build_seconds)
+        self.assertTrue(status[bb].log and not status[bb].finished)
+        self.assertEqual("2020-04-20T10:01:00.000+00:00", since)  # The newest minus the margin
+
+        # Only the files created since the previous query
+        results = [{"path": bb, "name": "FAILED", "created": "2020-04-20T10:00:30.000Z"}]
+        with mock.patch.object(self.meta.af.searches, "artifactory_query_language",
+                               return_value={"results": results}) as aql:
+            status, next_since = self.meta.get_nodes_status(build, since)
+        self.assertIn('"created": {"$gte": "2020-04-20T10:01:00.000+00:00"}',
+                      aql.call_args[0][0])
+        self.assertEqual([bb], list(status))
+        self.assertTrue(status[bb].failed)
+        self.assertEqual(since, next_since)  # Never back
+
+    def test_profile_workers(self):
+        def item_properties(repo, path):
+            if path == "profiles/windows":
+                return {"properties": {"worker": ["windows"]}}
+            raise RtpyBase.AfApiError({"api_method": "item_properties", "url": path,
+                                       "verb": "GET", "status_code": 404,
+                                       "message": "No properties could be found."})
+
+        with mock.patch.object(self.meta.af_store, "item_properties",
+                               side_effect=item_properties):
+            workers = self.meta.get_profile_workers(["linux_gcc", "windows"])
+        self.assertEqual({"windows": "windows"}, workers)
+
+    def test_remove_node_files(self):
+        build = Build("mybuild", "3")
+        build_conf = BuildConfiguration("P1/1.0@conan/stable", "linux_gcc")
+        not_found = RtpyBase.AfApiError({"api_method": "delete_item", "url": "", "verb": "DELETE",
+                                         "status_code": 404, "message": "Not found"})
+        with mock.patch.object(self.meta.af_store, "delete_item",
+                               side_effect=not_found) as delete:
+            self.meta.remove_node_files(build, build_conf, NodeInfo("1", "AA/1.0@conan/stable"))
+        delete.assert_called_once_with(
+            "meta", "lockfiles/mybuild/3/P1_1.0_conan_stable/linux_gcc/AA_1.0_conan_stable_1")
+
+    def test_find_package_revisions(self):
+        aa = "conan/AA/1.0/stable/rrev1/package/pkgid1"
+        bb = "conan/BB/1.0/stable/rrev1/package/pkgid1"
+        results = [{"repo": "develop", "path": aa + "/prev0", "created": "2020-01-01T10:00"},
+                   {"repo": "pre-develop", "path": aa + "/prev1", "created": "2020-01-02T10:00"},
+                   {"repo": "pre-develop", "path": bb + "/prev1", "created": "2020-01-01T10:00"},
+                   {"repo": "develop", "path": bb + "/prev1", "created": "2020-01-02T10:00"}]
+        with mock.patch.object(self.art.af.searches, "artifactory_query_language",
+                               return_value={"results": results}):
+            prevs = self.art.find_package_revisions(["develop", "pre-develop"], [aa, bb])
+        # The latest one, from the repo to read first when it was promoted
+        self.assertEqual({aa: ("prev1", "pre-develop"), bb: ("prev1", "develop")}, prevs)
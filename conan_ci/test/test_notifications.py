@@ -0,0 +1,31 @@
+import time
+import unittest
+
+from conan_ci.notifications import AdaptivePoller, CompletionWebhook, notify_job_ended
+
+
+class TestNotifications(unittest.TestCase):
+
+    def test_poller_backoff(self):
+        poller = AdaptivePoller(0.01, 0.04)
+        self.assertFalse(poller.wait(found_ended=False))
+        self.assertEqual(0.02, poller.delay)
+        poller.wait(found_ended=False)
+        poller.wait(found_ended=False)
+        self.assertEqual(0.04, poller.delay)
+        poller.wait(found_ended=True)
+        self.assertEqual(0.02, poller.delay)
+
+    def test_webhook_wakes_up_poller(self):
+        poller = AdaptivePoller(0.01, 60)
+        poller.delay = 60
+        webhook = CompletionWebhook(poller, 0)
+        webhook.start()
+        try:
+            notify_job_ended("http://127.0.0.1:{}/".format(webhook.port), {"node": "1"})
+            start = time.time()
+            self.assertTrue(poller.wait(found_ended=False))
+            self.assertLess(time.time() - start, 1)
+            self.assertEqual(0.01, poller.delay)
+        finally:
+            webhook.stop()
@@ -0,0 +1,103 @@
+import unittest
+
+from conan_ci.scheduler import BuildScheduler
+
+
+def _pref(name, prev=True):
+    pref = "{}/1.0@conan/stable#rrev1:pkgid1".format(name)
+    return pref + "#prev1" if prev else pref
+
+
+def _lock(nodes):
+    """nodes: {node_id: (name, built, [requires_ids])}"""
+    ret = {}
+    for node_id, (name, built, requires) in nodes.items():
+        ret[node_id] = {"pref": _pref(name, built), "options": "", "requires": requires}
+    return {"graph_lock": {"nodes": ret}, "version": "0.2"}
+
+
+class TestBuildScheduler(unittest.TestCase):
+
+    def test_diamond(self):
+        lock = _lock({"0": ("P1", True, ["1", "2"]),
+                      "1": ("BB", True, ["3"]),
+                      "2": ("CC", True, ["3"]),
+                      "3": ("AA", False, []),
+                      "4": ("ZZ", True, [])})
+        scheduler = BuildScheduler(lock)
+        self.assertEqual([["3", _pref("AA", False)]], scheduler.pop_ready())
+        self.assertEqual([], scheduler.pop_ready())
+
+        scheduler.node_ended("3")
+        self.assertEqual(["1", "2"], sorted(n for n, _ in scheduler.pop_ready()))
+        scheduler.node_ended("1")
+        self.assertEqual([], scheduler.pop_ready())
+        scheduler.node_ended("2")
+        self.assertEqual([["0", _pref("P1")]], scheduler.pop_ready())
+        self.assertFalse(scheduler.finished())
+        scheduler.node_ended("0")
+        self.assertTrue(scheduler.finished())
+
+    def test_node_released_before_its_level_drains(self):
+        lock = _lock({"0": ("P1", True, ["1", "2"]),
+                      "1": ("BB", True, ["3"]),
+                      "2": ("CC", True, ["4"]),
+                      "3": ("AA", False, []),
+                      "4": ("DD", False, [])})
+        scheduler = BuildScheduler(lock)
+        self.assertEqual(["3", "4"], sorted(n for n, _ in scheduler.pop_ready()))
+        scheduler.node_ended("3")
+        self.assertEqual([["1", _pref("BB")]], scheduler.pop_ready())
+
+    def test_virtual_root_and_built_nodes(self):
+        lock = _lock({"1": ("AA", True, [])})
+        lock["graph_lock"]["nodes"]["0"] = {"pref": None, "requires": ["1"]}
+        scheduler = BuildScheduler(lock)
+        self.assertEqual([], scheduler.pop_ready())
+        self.assertTrue(scheduler.finished())
+
+    def test_resume_from_merged_lock(self):
+        lock = _lock({"0": ("P1", True, ["1", "2"]),
+                      "1": ("BB", True, ["3"]),
+                      "2": ("CC", True, ["3"]),
+                      "3": ("AA", True, [])})
+        lock["graph_lock"]["nodes"]["3"]["modified"] = "Build"
+        scheduler = BuildScheduler(lock)
+        self.assertEqual(["1", "2"], sorted(n for n, _ in scheduler.pop_ready()))
+        self.assertEqual(["3"], scheduler.ended)
+        scheduler.node_ended("1")
+        scheduler.node_ended("2")
+        self.assertEqual([["0", _pref("P1")]], scheduler.pop_ready())
+
+    def test_resume_with_skipped_nodes(self):
+        lock = _lock({"0": ("P1", True, ["1", "2"]),
+                      "1": ("BB", True, ["3"]),
+                      "2": ("CC", True, ["3"]),
+                      "3": ("AA", True, []),
+                      "4": ("ZZ", True, [])})
+        # AA was skipped, with a binary already in the repos, so it is not "modified"
+        scheduler = BuildScheduler(lock, to_build=["3", "1", "2", "0"], ended=["3"])
+        self.assertEqual(["3"], scheduler.ended)
+        self.assertEqual(["3", "1", "2", "0"], scheduler.to_build)
+        self.assertEqual(["1", "2"], sorted(n for n, _ in scheduler.pop_ready()))
+        self.assertFalse(scheduler.finished())
+
+    def test_critical_path_first(self):
+        lock = _lock({"0": ("P1", True, ["1", "2"]),
+                      "1": ("BB", True, ["3"]),
+                      "2": ("CC", False, []),
+                      "3": ("AA", False, [])})
+        durations = {"P1/1.0@conan/stable": 10, "BB/1.0@conan/stable": 100,
+                     "CC/1.0@conan/stable": 50, "AA/1.0@conan/stable": 10}
+        scheduler = BuildScheduler(lock, durations)
+        self.assertEqual(120, scheduler.priority("3"))
+        self.assertEqual(60, scheduler.priority("2"))
+        self.assertEqual(["3", "2"], [n for n, _ in scheduler.pop_ready()])
+
+    def test_final_package_id(self):
+        lock = _lock({"0": ("P1", True, ["1"]),
+                      "1": ("BB", True, ["2"]),
+                      "2": ("AA", False, [])})
+        scheduler = BuildScheduler(lock)
+        self.assertTrue(scheduler.has_final_package_id("2"))
+        self.assertFalse(scheduler.has_final_package_id("1"))
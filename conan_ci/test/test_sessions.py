@@ -0,0 +1,19 @@
+import unittest
+
+from rtpy import Rtpy
+
+from conan_ci.sessions import get_session, pool_size, share_session
+
+
+class TestSessions(unittest.TestCase):
+
+    def test_shared_by_all_the_clients(self):
+        settings = {"af_url": "http://localhost:8090/artifactory", "username": "admin",
+                    "password": "password"}
+        af1, af2 = Rtpy(settings), Rtpy(settings)
+        share_session(af1)
+        share_session(af2)
+        session = get_session()
+        self.assertIs(session, af1.searches._user_settings["session"])
+        self.assertIs(session, af2.artifacts_and_storage._user_settings["session"])
+        self.assertEqual(pool_size(), session.get_adapter("https://host")._pool_maxsize)
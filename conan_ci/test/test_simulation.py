@@ -0,0 +1,169 @@
+import contextlib
+import io
+import time
+import unittest
+
+from conan_ci.simulation.graphs import SHAPES, base_ref, library_ref, lock_data
+from conan_ci.simulation.simulator import SimulatedCIAPICaller, SimulatedMetaRepo, \
+    SimulatedNodeChain, VirtualClock, simulate
+
+
+def _duration(profile_name, ref):
+    return 10
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_graphs(self):
+        for shape in SHAPES.values():
+            requires = shape(30)
+            required = set()
+            for index, reqs in enumerate(requires):
+                self.assertTrue(all(r > index for r in reqs))
+                required.update(reqs)
+            self.assertEqual(set(range(1, 30)), required)
+
+    def test_deep(self):
+        requires = SHAPES["deep"](5)
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        report = simulate(locks, base_ref(requires), ["linux_gcc"], duration=_duration)
+        self.assertIsNone(report.error)
+        self.assertEqual(6, report.jobs)  # The libraries and the project
+        self.assertEqual(60, report.makespan)
+        self.assertEqual(6, report.rounds)
+        self.assertEqual({"P1/1.0@conan/stable": 60}, report.published)
+
+    def test_large_graph(self):
+        # The work of every tick doesn't depend on the running jobs, thousands of them
+        requires = SHAPES["wide"](3000)
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        start = time.perf_counter()
+        report = simulate(locks, base_ref(requires), ["linux_gcc"])
+        self.assertLess(time.perf_counter() - start, 15)
+        self.assertIsNone(report.error)
+        self.assertEqual(3001, report.jobs)
+
+    def test_limits_and_failures(self):
+        requires = SHAPES["wide"](10)
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        report = simulate(locks, base_ref(requires), ["linux_gcc", "windows_msvc"],
+                          duration=_duration, worker_limits={"linux": 2})
+        # base, 8 libraries in parallel (2 at a time in linux), top library and project
+        self.assertEqual(70, report.makespan)
+        self.assertEqual(2, report.peak["linux"])
+        self.assertEqual(8, report.peak["windows"])
+        # 11 jobs of 10 seconds in 2 linux workers during 70 seconds
+        self.assertAlmostEqual(110 / 140, report.utilization["linux"])
+
+        report = simulate(locks, base_ref(requires), ["linux_gcc"], duration=_duration,
+                          failure_rate=1)
+        self.assertEqual(1, report.jobs)
+        self.assertIn("Simulated failure", report.error)
+
+    def test_skip_already_built(self):
+        requires = SHAPES["diamond"](4)
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        # The base library was built before for the exported revision
+        existing = {"conan/lib3/1.0/stable/simulated/package/pkgid3": "prev_old"}
+        report = simulate(locks, base_ref(requires), ["linux_gcc"], duration=_duration,
+                          existing_packages=existing)
+        self.assertIsNone(report.error)
+        self.assertEqual(4, report.jobs)  # lib0, lib1, lib2 and the project
+        self.assertEqual(30, report.makespan)
+
+    def test_share_packages_between_projects(self):
+        requires = SHAPES["deep"](3)
+        locks = {ref: lock_data(ref, requires)
+                 for ref in ("P1/1.0@conan/stable", "P2/1.0@conan/stable")}
+        report = simulate(locks, base_ref(requires), ["linux_gcc", "windows_msvc"],
+                          duration=_duration)
+        self.assertIsNone(report.error)
+        # Every library once per profile, every project once per profile
+        self.assertEqual(2 * 3 + 2 * 2, report.jobs)
+        self.assertEqual(40, report.makespan)
+        self.assertEqual({"P1/1.0@conan/stable": 40, "P2/1.0@conan/stable": 40},
+                         report.published)
+
+    def test_not_shared_with_other_options(self):
+        requires = SHAPES["deep"](3)
+        locks = {ref: lock_data(ref, requires)
+                 for ref in ("P1/1.0@conan/stable", "P2/1.0@conan/stable")}
+        # The same library with other options in P2, the lock package id is not final
+        locks["P2/1.0@conan/stable"]["graph_lock"]["nodes"]["3"]["options"] = "shared=True"
+        report = simulate(locks, base_ref(requires), ["linux_gcc"], duration=_duration)
+        self.assertIsNone(report.error)
+        # The base library once, lib1 and lib0 (requires another lib1) in every project
+        self.assertEqual(1 + 2 * 2 + 2, report.jobs)
+
+    def test_skip_not_impacted_projects(self):
+        requires = SHAPES["deep"](3)
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires),
+                 "P2/1.0@conan/stable": lock_data("P2/1.0@conan/stable", [[]])}
+        report = simulate(locks, base_ref(requires), ["linux_gcc"], duration=_duration)
+        self.assertIsNone(report.error)
+        self.assertEqual(4, report.jobs)
+        self.assertEqual(["P1/1.0@conan/stable"], list(report.published))
+
+    def test_resume(self):
+        requires = SHAPES["wide"](4)  # lib0 -> (lib1, lib2) -> lib3
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        durations = {library_ref(2): 30}
+        clock = VirtualClock()
+        meta = SimulatedMetaRepo(list(locks), ["linux_gcc"])
+        caller = SimulatedCIAPICaller(clock, meta, lambda p, ref: durations.get(ref, 10),
+                                      failing=[library_ref(1)])
+        chain = SimulatedNodeChain(locks, base_ref(requires), caller, meta, clock)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaisesRegex(Exception, "Simulated failure"):
+                chain.run()
+            self.assertEqual(20, clock.now)  # lib1 failed while lib2 is still running
+            self.assertEqual(3, caller.jobs)
+            # The duration of the jobs ended before the failure is not lost
+            self.assertIn(library_ref(3), meta.build_durations["linux_gcc"])
+
+            # The coordinator restarts: lib2 is attached and lib1 launched again
+            caller.failing.clear()
+            chain = SimulatedNodeChain(locks, base_ref(requires), caller, meta, clock,
+                                       resume=True)
+            chain.run()
+        self.assertEqual(6, caller.jobs)  # lib1 again, lib0 and the project
+        self.assertEqual(60, clock.now)
+        self.assertEqual({"P1/1.0@conan/stable": 60}, chain.published_times)
+
+    def test_resume_after_skipped_node(self):
+        requires = SHAPES["deep"](3)  # lib0 -> lib1 -> lib2
+        locks = {"P1/1.0@conan/stable": lock_data("P1/1.0@conan/stable", requires)}
+        existing = {"conan/lib2/1.0/stable/simulated/package/pkgid2": "prev_old"}
+        clock = VirtualClock()
+        meta = SimulatedMetaRepo(list(locks), ["linux_gcc"])
+        caller = SimulatedCIAPICaller(clock, meta, _duration, failing=[library_ref(1)])
+        chain = SimulatedNodeChain(locks, base_ref(requires), caller, meta, clock,
+                                   existing_packages=existing)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaisesRegex(Exception, "Simulated failure"):
+                chain.run()
+            self.assertEqual(1, caller.jobs)  # lib2 skipped, lib1 failed
+
+            # The skipped lib2 is ended, its dependents are still to build
+            caller.failing.clear()
+            chain = SimulatedNodeChain(locks, base_ref(requires), caller, meta, clock,
+                                       existing_packages=existing, resume=True)
+            chain.run()
+        self.assertEqual(4, caller.jobs)  # lib1 again, lib0 and the project
+        self.assertEqual(40, clock.now)
+        self.assertEqual({"P1/1.0@conan/stable": 40}, chain.published_times)
+
+    def test_impacted_by_other_version(self):
+        projects = ["P1/1.0@conan/stable", "P2/1.0@conan/stable", "P3/1.0@conan/stable"]
+        last_refs = {"P1/1.0@conan/stable": ["lib0/1.0@conan/stable"],
+                     "P2/1.0@conan/stable": ["lib0/1.0@other/testing"]}
+        meta = SimulatedMetaRepo(projects, ["linux_gcc"], last_refs=last_refs)
+        clock = VirtualClock()
+        chain = SimulatedNodeChain({}, "lib0/1.1@conan/stable",
+                                   SimulatedCIAPICaller(clock, meta, _duration), meta, clock)
+        chain._projects_refs = projects
+        chain._profiles_names = ["linux_gcc"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            impacted = chain._impacted_projects("lib0/1.1@conan/stable")
+        # A version range in P1 takes the new version, P3 has never been built
+        self.assertEqual(["P1/1.0@conan/stable", "P3/1.0@conan/stable"], impacted)
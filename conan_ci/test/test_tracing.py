@@ -0,0 +1,34 @@
+import json
+import unittest
+
+from conan_ci import tracing
+from conan_ci.tracing import Tracer, activate, span
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_spans(self):
+        tracer = Tracer()
+        with activate(tracer):
+            with span("artifactory.download", path="lockfiles/conan.lock"):
+                with span("artifactory.aql"):
+                    pass
+            with span("artifactory.aql"):
+                pass
+        with span("not_traced"):
+            pass
+        self.assertIsNone(tracing._current)
+
+        data = json.loads(tracer.dumps())
+        events = data["traceEvents"]
+        self.assertEqual(["artifactory.aql", "artifactory.download", "artifactory.aql"],
+                         [e["name"] for e in events])
+        self.assertEqual("X", events[0]["ph"])
+        self.assertEqual("artifactory", events[0]["cat"])
+        self.assertEqual({"path": "lockfiles/conan.lock"}, events[1]["args"])
+        self.assertLessEqual(events[1]["ts"], events[0]["ts"])
+
+        summary = tracer.summary().splitlines()
+        self.assertEqual(3, len(summary))
+        self.assertTrue(summary[0].startswith("Span"))
+        self.assertIn(" 2 ", [line for line in summary if "aql" in line][0])
@@ -0,0 +1,77 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class Tracer(object):
+    """Timed spans of the coordinator phases, saved in the Chrome trace event format
+    (chrome://tracing or https://ui.perfetto.dev) and summarized as a table"""
+
+    def __init__(self):
+        self.events = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {"name": name,
+                     "cat": name.split(".")[0],
+                     "ph": "X",
+                     "ts": (start - self._start) * 1e6,
+                     "dur": (end - start) * 1e6,
+                     "pid": os.getpid(),
+                     "tid": threading.get_ident(),
+                     "args": {k: str(v) for k, v in attrs.items()}}
+            with self._lock:
+                self.events.append(event)
+
+    def dumps(self):
+        return json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"})
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.dumps())
+
+    def summary(self):
+        """Table with the count and seconds of every span name, the slowest first"""
+        times = defaultdict(list)
+        for event in self.events:
+            times[event["name"]].append(event["dur"] / 1e6)
+        rows = sorted(times.items(), key=lambda item: -sum(item[1]))
+        width = max([len(name) for name in times] + [4])
+        lines = ["{:<{w}} {:>7} {:>10} {:>10} {:>10}".format("Span", "Count", "Total(s)",
+                                                            "Mean(s)", "Max(s)", w=width)]
+        for name, durations in rows:
+            lines.append("{:<{w}} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                name, len(durations), sum(durations), sum(durations) / len(durations),
+                max(durations), w=width))
+        return "\n".join(lines)
+
+
+_current = None
+
+
+def span(name, **attrs):
+    """A span in the active tracer, nothing is recorded out of a NodeChain run"""
+    if _current is None:
+        return contextlib.nullcontext()
+    return _current.span(name, **attrs)
+
+
+@contextlib.contextmanager
+def activate(tracer: Tracer):
+    global _current
+    previous = _current
+    _current = tracer
+    try:
+        yield tracer
+    finally:
+        _current = previous